@@ -1,14 +1,7 @@
 from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
 
-# Usamos la misma URL que tenías en tu main.py original
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:securepassword123@db:5432/wealthroad")
-
-# Configuración del motor de DB
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Un único engine (con pool) para toda la app: ver app/db/session.py
+from app.db.session import engine, SessionLocal
 
 def get_db() -> Generator:
     """
@@ -22,4 +15,4 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-# AQUÍ AGREGAREMOS LUEGO: get_current_user (Para leer el token JWT)
\ No newline at end of file
+# AQUÍ AGREGAREMOS LUEGO: get_current_user (Para leer el token JWT)
@@ -1,15 +1,19 @@
 # app/api/v1/endpoints/accounts.py
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.responses import etag_json_response
 from app.models.portfolio import Account, Portfolio
 from app.schemas import portfolio as schemas
 
 router = APIRouter()
 
+_accounts_adapter = TypeAdapter(List[schemas.AccountRead])
+
 # --------------------------------------------------------------------------
 # CREATE
 # --------------------------------------------------------------------------
@@ -53,16 +57,19 @@ def create_account(
 # --------------------------------------------------------------------------
 @router.get("/", response_model=List[schemas.AccountRead])
 def read_accounts(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = Query(100, le=50000, description="Maximum 50000 records per request"),
     portfolio_id: Optional[int] = None,
-    currency: Optional[str] = None
+    currency: Optional[str] = None,
+    account_code: Optional[str] = None
 ):
     """
     Obtener lista de cuentas.
-    Filtros opcionales: portfolio_id, currency.
+    Filtros opcionales: portfolio_id, currency, account_code (match exacto, 0 o 1 fila).
     Límite máximo: 50000 registros por request.
+    Devuelve ETag; con If-None-Match igual responde 304 (revalidación del preload del ETL).
     """
     query = db.query(Account)
     
@@ -70,9 +77,13 @@ def read_accounts(
         query = query.filter(Account.portfolio_id == portfolio_id)
     if currency:
         query = query.filter(Account.currency == currency)
+    if account_code:
+        query = query.filter(Account.account_code == account_code)
         
-    accounts = query.offset(skip).limit(limit).all()
-    return accounts
+    # Orden estable por PK: el ETL pagina con skip/limit
+    accounts = query.order_by(Account.account_id).offset(skip).limit(limit).all()
+    body = _accounts_adapter.dump_json(_accounts_adapter.validate_python(accounts, from_attributes=True))
+    return etag_json_response(body, request)
 
 @router.get("/{account_id}", response_model=schemas.AccountRead)
 def read_account(
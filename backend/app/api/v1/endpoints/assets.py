@@ -1,28 +1,39 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 import traceback
 from app.api import deps
+from app.core.responses import etag_json_response
 from app.models.asset import Asset
 from app.schemas.asset import AssetCreate, AssetRead, AssetUpdate
 
 router = APIRouter()
 
+_assets_adapter = TypeAdapter(List[AssetRead])
+
 @router.get("/", response_model=List[AssetRead])
 def read_assets(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
+    symbols: Optional[str] = Query(None, description="Comma-separated exact symbols (batch lookup)"),
     class_id: Optional[int] = None,
     is_active: bool = True
 ) -> Any:
     """
     Retrieve assets with optional filtering.
+    Sends an ETag; a matching If-None-Match gets 304 with no body.
     """
     query = db.query(Asset).filter(Asset.is_active == is_active)
     
+    if symbols:
+        # Lookup exacto de varios símbolos en una sola consulta (usa ix_assets_symbol)
+        query = query.filter(Asset.symbol.in_([s for s in symbols.split(",") if s]))
+    
     if class_id:
         query = query.filter(Asset.class_id == class_id)
 
@@ -37,8 +48,10 @@ def read_assets(
             )
         )
         
-    assets = query.offset(skip).limit(limit).all()
-    return assets
+    # Stable PK order so skip/limit pages (ETL preload) neither overlap nor skip rows
+    assets = query.order_by(Asset.asset_id).offset(skip).limit(limit).all()
+    body = _assets_adapter.dump_json(_assets_adapter.validate_python(assets, from_attributes=True))
+    return etag_json_response(body, request)
 
 # app/api/v1/endpoints/assets.py
 
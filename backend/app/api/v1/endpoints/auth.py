@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from app.api.deps import get_db
 from app.models.user import User, Role
@@ -53,25 +54,25 @@ def login(credentials: LoginRequest, db: Session = Depends(get_db)):
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
 def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Registro de nuevo usuario"""
+    # Hash antes de tocar la DB: no retiene una conexión del pool durante bcrypt
+    password_hash = get_password_hash(user_data.password)
+    
     # Verificar si el email ya existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    if db.query(exists().where(User.email == user_data.email)).scalar():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado"
         )
     
     # Verificar si el username ya existe
-    existing_username = db.query(User).filter(User.username == user_data.username).first()
-    if existing_username:
+    if db.query(exists().where(User.username == user_data.username)).scalar():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El nombre de usuario ya está en uso"
         )
     
     # Verificar que el rol existe
-    role = db.query(Role).filter(Role.role_id == user_data.role_id).first()
-    if not role:
+    if not db.query(exists().where(Role.role_id == user_data.role_id)).scalar():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Rol inválido"
@@ -81,7 +82,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         full_name=user_data.full_name,
         phone=user_data.phone,
         tax_id=user_data.tax_id,
@@ -92,7 +93,6 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
     
     return new_user
 
@@ -571,7 +571,10 @@ def _run_single_etl_job(job_id: int, report_type: str):
         if not query_id:
             raise ValueError(f"No query ID configured for {report_type}")
         
-        file_path = downloader.download_report(report_type, query_id)
+        try:
+            file_path = downloader.download_report(report_type, query_id)
+        finally:
+            downloader.close()
         
         if not file_path or not file_path.exists():
             job.status = "failed"
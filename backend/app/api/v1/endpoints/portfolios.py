@@ -15,10 +15,12 @@ def get_portfolios(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    active_only: bool = True
+    active_only: bool = True,
+    interface_code: Optional[str] = None
 ) -> Any:
     """
     Lista todos los portfolios con sus cuentas y advisors.
+    interface_code filtra por código exacto (lookup del ETL, 0 o 1 fila).
     """
     query = db.query(Portfolio).options(
         joinedload(Portfolio.accounts),
@@ -28,6 +30,8 @@ def get_portfolios(
     
     if active_only:
         query = query.filter(Portfolio.active_status == True)
+    if interface_code:
+        query = query.filter(Portfolio.interface_code == interface_code)
     
     portfolios = query.order_by(Portfolio.name).offset(skip).limit(limit).all()
     return portfolios
@@ -1,20 +1,30 @@
-from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from decimal import Decimal
-from datetime import date, datetime
+import base64
+import hashlib
+import json
+import time
+from typing import List, NamedTuple, Optional, Tuple, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Text, and_, cast, func, insert, lambda_stmt, literal_column, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, joinedload, load_only
+from pydantic import BaseModel, TypeAdapter
+from datetime import date
 
 from app.api import deps
-from app.models.asset import Trades, CashJournal, FXTransaction, CorporateAction, Position
-from app.models.portfolio import Account
+from app.core.responses import etag_json_response
+from app.db.session import SessionLocal
+from app.models.asset import Asset, Trades, CashJournal, FXTransaction, CorporateAction, Position
+from app.models.portfolio import Account, Portfolio
+from app.models.user import User
 from app.schemas.asset import (
-    TradeBase, TradeRead, TradeCreate,
-    CashJournalBase, CashJournalRead,
-    FXTransactionBase, FXTransactionRead, FXTransactionCreate,
-    CorporateActionBase, CorporateActionRead,
-    PositionBase, PositionRead, PositionCreate,
+    TradeRead, TradeCreate,
+    CashJournalRead, CashJournalCreate,
+    FXTransactionRead, FXTransactionCreate,
+    CorporateActionRead, CorporateActionCreate,
     BulkTradesRequest, BulkFXTransactionsRequest, BulkPositionsRequest,
+    BulkCashJournalRequest, BulkCorporateActionsRequest,
     BulkResponse
 )
 
@@ -40,6 +50,18 @@ class ImportantTransaction(BaseModel):
     investor_name: Optional[str] = None
 
 
+def _owner_chain(account_rel):
+    """
+    joinedload cuenta -> portfolio -> owner trayendo solo lo que usa el dashboard
+    (sin password_hash ni el resto de columnas de cada tabla unida).
+    """
+    return (
+        joinedload(account_rel).load_only(Account.account_id, Account.portfolio_id)
+        .joinedload(Account.portfolio).load_only(Portfolio.portfolio_id, Portfolio.name, Portfolio.owner_user_id)
+        .joinedload(Portfolio.owner).load_only(User.user_id, User.full_name)
+    )
+
+
 @router.get("/important-transactions", response_model=List[ImportantTransaction])
 def get_important_transactions(
     db: Session = Depends(deps.get_db),
@@ -50,11 +72,6 @@ def get_important_transactions(
     Returns the transactions sorted by date (descending), then by amount (descending).
     Types: 'Trade', 'Cash', 'FX', 'Corporate Action'
     """
-    from app.models.portfolio import Account, Portfolio
-    from app.models.user import User
-    from sqlalchemy.orm import joinedload
-    from sqlalchemy import func
-    
     important_transactions = []
     
     # 1. Get trades with largest amounts
@@ -63,8 +80,12 @@ def get_important_transactions(
     ).join(
         Portfolio, Account.portfolio_id == Portfolio.portfolio_id
     ).options(
-        joinedload(Trades.account).joinedload(Account.portfolio).joinedload(Portfolio.owner),
-        joinedload(Trades.asset)
+        load_only(
+            Trades.transaction_id, Trades.trade_date, Trades.side, Trades.quantity,
+            Trades.price, Trades.currency, Trades.account_id, Trades.asset_id
+        ),
+        _owner_chain(Trades.account),
+        joinedload(Trades.asset).load_only(Asset.asset_id, Asset.symbol)
     ).order_by(
         func.abs(func.coalesce(Trades.quantity, 0) * func.coalesce(Trades.price, 0)).desc()
     ).limit(limit * 2).all()
@@ -99,7 +120,11 @@ def get_important_transactions(
     ).join(
         Portfolio, Account.portfolio_id == Portfolio.portfolio_id
     ).options(
-        joinedload(CashJournal.account).joinedload(Account.portfolio).joinedload(Portfolio.owner)
+        load_only(
+            CashJournal.journal_id, CashJournal.date, CashJournal.type, CashJournal.amount,
+            CashJournal.description, CashJournal.currency, CashJournal.account_id
+        ),
+        _owner_chain(CashJournal.account)
     ).order_by(
         func.abs(func.coalesce(CashJournal.amount, 0)).desc()
     ).limit(limit * 2).all()
@@ -130,7 +155,12 @@ def get_important_transactions(
     ).join(
         Portfolio, Account.portfolio_id == Portfolio.portfolio_id
     ).options(
-        joinedload(FXTransaction.account).joinedload(Account.portfolio).joinedload(Portfolio.owner)
+        load_only(
+            FXTransaction.fx_id, FXTransaction.trade_date, FXTransaction.source_currency,
+            FXTransaction.target_currency, FXTransaction.source_amount, FXTransaction.exchange_rate,
+            FXTransaction.account_id
+        ),
+        _owner_chain(FXTransaction.account)
     ).order_by(
         func.abs(func.coalesce(FXTransaction.source_amount, 0)).desc()
     ).limit(limit).all()
@@ -161,7 +191,12 @@ def get_important_transactions(
     ).join(
         Portfolio, Account.portfolio_id == Portfolio.portfolio_id
     ).options(
-        joinedload(CorporateAction.account).joinedload(Account.portfolio).joinedload(Portfolio.owner)
+        load_only(
+            CorporateAction.action_id, CorporateAction.execution_date, CorporateAction.report_date,
+            CorporateAction.action_type, CorporateAction.description, CorporateAction.symbol,
+            CorporateAction.amount, CorporateAction.currency, CorporateAction.account_id
+        ),
+        _owner_chain(CorporateAction.account)
     ).order_by(
         func.abs(func.coalesce(CorporateAction.amount, 0)).desc()
     ).limit(limit).all()
@@ -192,84 +227,371 @@ def get_important_transactions(
     return important_transactions[:limit]
 
 
-# ==========================================================================
-# SCHEMAS FOR CREATE OPERATIONS
-# ==========================================================================
+# --------------------------------------------------------------------------
+# COLUMN PROJECTION + KEYSET PAGINATION + STREAMING (shared by the list endpoints)
+# --------------------------------------------------------------------------
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# El navegador puede guardar el listado pero debe revalidarlo (If-None-Match) siempre
+LIST_CACHE_CONTROL = "private, no-cache"
+
+# Por encima de este `limit` la respuesta se serializa en streaming
+STREAM_THRESHOLD = 500
+STREAM_CHUNK_SIZE = 1000
+
+
+class _ListSpec(NamedTuple):
+    """Qué serializa un listado y por qué columnas se ordena/pagina."""
+    schema: Any
+    adapter: TypeAdapter
+    columns: list
+    date_col: Any
+    id_col: Any
+
+
+def _read_columns(model, schema) -> list:
+    """Columnas del modelo que el schema de lectura realmente serializa (proyección del listado)."""
+    return [getattr(model, name) for name in schema.model_fields if name in model.__table__.c]
+
+
+def _list_spec(model, schema, date_col, id_col) -> _ListSpec:
+    # El TypeAdapter se construye una sola vez por listado (no en cada request)
+    return _ListSpec(schema, TypeAdapter(List[schema]), _read_columns(model, schema), date_col, id_col)
+
+
+_TRADES_LIST = _list_spec(Trades, TradeRead, Trades.trade_date, Trades.transaction_id)
+_CASH_JOURNAL_LIST = _list_spec(CashJournal, CashJournalRead, CashJournal.date, CashJournal.journal_id)
+_FX_LIST = _list_spec(FXTransaction, FXTransactionRead, FXTransaction.trade_date, FXTransaction.fx_id)
+_CORPORATE_ACTIONS_LIST = _list_spec(CorporateAction, CorporateActionRead, CorporateAction.report_date, CorporateAction.action_id)
+
+
+def _encode_cursor(last_date: Optional[date], last_id: int) -> str:
+    payload = json.dumps([last_date.isoformat() if last_date else None, last_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        last_date, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (date.fromisoformat(last_date) if last_date else None), int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _stream_json(query, schema, headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Serializa el listado fila a fila (yield_per + cursor del lado del servidor)
+    en lugar de materializar .all(): memoria O(chunk) y el primer byte sale antes.
+    La sesión de la request se cierra al terminar el handler, así que el
+    generador trabaja con su propia sesión.
+    """
+    def generate():
+        with SessionLocal() as stream_db:
+            yield b"["
+            for i, row in enumerate(query.with_session(stream_db).yield_per(STREAM_CHUNK_SIZE)):
+                if i:
+                    yield b","
+                yield schema.model_validate(row, from_attributes=True).model_dump_json().encode()
+            yield b"]"
+    
+    return StreamingResponse(generate(), media_type="application/json", headers=headers)
+
+
+def _page_etag(page, spec: _ListSpec, request: Request) -> str:
+    """
+    ETag débil de una página en streaming: md5, calculado en Postgres, de las
+    columnas proyectadas de las filas que se van a enviar (en el orden del
+    listado) + los query params. Cualquier alta, baja o edición de una fila de la
+    página cambia el ETag; la consulta está acotada por el LIMIT de la página.
+    """
+    rows = page.subquery()
+    row_text = cast(func.json_build_array(*rows.c), Text)
+    in_order = aggregate_order_by(
+        literal_column("','"), rows.c[spec.date_col.key].desc(), rows.c[spec.id_col.key].desc()
+    )
+    page_hash = page.session.query(func.md5(func.string_agg(row_text, in_order))).scalar()
+    digest = hashlib.md5(f"{page_hash}:{request.url.query}".encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _paginate(
+    query, request: Request, spec: _ListSpec, skip: int, limit: int,
+    cursor: Optional[str], after_date: Optional[date] = None, after_id: Optional[int] = None
+):
+    """
+    Ordena por (fecha DESC, id DESC) y pagina.
+    Con `cursor` (o `after_date` + `after_id` explícitos) usa keyset
+    (WHERE (fecha, id) < (:fecha, :id)), coste constante por página;
+    sin ellos cae al OFFSET `skip` (deprecado, se mantiene por compatibilidad).
+    El cursor de la siguiente página se devuelve en el header X-Next-Cursor.
+    Solo se seleccionan las columnas del schema (filas Core, sin objetos ORM ni identity map)
+    y la página se serializa a JSON de una vez con el TypeAdapter del listado.
+    Para `limit` > STREAM_THRESHOLD la respuesta se envía en streaming.
+    El ETag sale de la propia página (hash del cuerpo, o hash en SQL de sus
+    filas en streaming), nunca de un agregado sobre todo el conjunto filtrado;
+    responde 304 si el If-None-Match del cliente coincide.
+    """
+    date_col, id_col = spec.date_col, spec.id_col
+    query = query.order_by(date_col.desc(), id_col.desc())
+    
+    if after_id is not None:
+        cursor = _encode_cursor(after_date, after_id)
+    elif after_date is not None:
+        raise HTTPException(status_code=400, detail="after_date requires after_id")
+    
+    if cursor:
+        last_date, last_id = _decode_cursor(cursor)
+        if last_date is None:
+            # Las fechas NULL van primero en DESC: seguimos dentro de ese bloque
+            query = query.filter(or_(date_col.isnot(None), and_(date_col.is_(None), id_col < last_id)))
+        else:
+            query = query.filter(tuple_(date_col, id_col) < (last_date, last_id))
+        skip = 0
+    
+    page = query.with_entities(*spec.columns)
+    if skip:
+        page = page.offset(skip)
+    page = page.limit(limit)
+    
+    if limit <= STREAM_THRESHOLD:
+        rows = page.all()
+        body = spec.adapter.dump_json(spec.adapter.validate_python(rows, from_attributes=True))
+        response = etag_json_response(body, request, LIST_CACHE_CONTROL)
+        if len(rows) == limit:
+            last = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(getattr(last, date_col.key), getattr(last, id_col.key))
+        return response
+    
+    # Export grande: los headers salen antes que el cuerpo, así que el ETag (hash
+    # de la página en SQL) y la fila frontera (última de la página, consulta de
+    # solo índice) se resuelven antes
+    cache_headers = {"ETag": _page_etag(page, spec, request), "Cache-Control": LIST_CACHE_CONTROL}
+    if cache_headers["ETag"] in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=cache_headers)
+    
+    boundary = query.with_entities(date_col, id_col).offset(skip + limit - 1).limit(1).first()
+    if boundary:
+        cache_headers[NEXT_CURSOR_HEADER] = _encode_cursor(*boundary)
+    return _stream_json(page, spec.schema, cache_headers)
+
+
+# --------------------------------------------------------------------------
+# ACCOUNT EXISTENCE (cache por worker)
+# --------------------------------------------------------------------------
+# Las cuentas casi nunca cambian y los POST del ETL validan las mismas una y otra
+# vez. Solo se cachean las que existen (una cuenta recién creada se ve al instante);
+# el TTL acota cuánto se sigue aceptando una cuenta borrada, y en ese caso la FK
+# rechaza igualmente el INSERT.
+ACCOUNT_CACHE_TTL = 300  # segundos
+_known_accounts = {}  # account_id -> expiración (time.monotonic())
+
+
+def _account_exists(db: Session, account_id: int) -> bool:
+    now = time.monotonic()
+    if _known_accounts.get(account_id, 0) > now:
+        return True
+    
+    exists = db.query(Account.account_id).filter(Account.account_id == account_id).first() is not None
+    if exists:
+        _known_accounts[account_id] = now + ACCOUNT_CACHE_TTL
+    else:
+        _known_accounts.pop(account_id, None)
+    return exists
+
+
+# --------------------------------------------------------------------------
+# BULK INSERT (shared by the *_bulk endpoints)
+# --------------------------------------------------------------------------
+# Filas por INSERT: Postgres deja de ganar throughput pasadas ~1000 filas por
+# sentencia y los parámetros de un INSERT gigante inflan la memoria del request.
+BULK_CHUNK_SIZE = 1000
+
+# Errores detallados que devuelve un bulk (el resto solo se cuenta)
+MAX_BULK_ERRORS = 10
+
+
+def _insert_stmt(model, rows: List[dict], conflict_col=None):
+    """
+    INSERT multi-fila [ON CONFLICT (conflict_col) DO NOTHING] RETURNING pk.
+    Se construye sobre la Table (Core puro), no sobre la entidad: así no pasa por el
+    bulk insert del ORM (sin InstanceState, identity map ni coerción por fila en Python).
+    """
+    table = model.__table__
+    if conflict_col is None:
+        stmt = insert(table).values(rows)
+    else:
+        stmt = pg_insert(table).values(rows).on_conflict_do_nothing(index_elements=[conflict_col.key])
+    return stmt.returning(*table.primary_key.columns)
+
+
+def _scan_batch(rows: List[tuple], key: Optional[str] = None) -> Tuple[List[tuple], set]:
+    """
+    Una sola pasada sobre el lote: deja la primera aparición de cada `key` no nulo
+    (las filas sin clave se conservan) y junta los account_id de las filas que quedan.
+    """
+    seen = set()
+    unique = []
+    account_ids = set()
+    for idx, row in rows:
+        if key is not None:
+            value = row[key]
+            if value:
+                if value in seen:
+                    continue
+                seen.add(value)
+        account_ids.add(row["account_id"])
+        unique.append((idx, row))
+    return unique, account_ids
+
+
+class _BulkErrors:
+    """
+    Errores de un bulk: los cuenta todos pero solo guarda el detalle de los primeros
+    MAX_BULK_ERRORS (lo único que viaja en la respuesta). Un lote de 100k filas malas
+    no construye 100k dicts para tirarlos, ni formatea sus mensajes.
+    `describe(row)` agrega el contexto de cada error guardado.
+    """
+    def __init__(self, describe):
+        self.describe = describe
+        self.count = 0
+        self.items = []
+    
+    def add(self, idx: int, error, row: dict):
+        self.count += 1
+        if len(self.items) < MAX_BULK_ERRORS:
+            self.items.append({"index": idx, "error": str(error), **self.describe(row)})
+
+
+def _split_unknown_accounts(db: Session, rows: List[tuple], account_ids: set, errors: _BulkErrors) -> List[tuple]:
+    """
+    Valida las cuentas de todo el lote con una sola consulta IN (solo las que no están
+    en el cache de cuentas), en vez de dejar que cada fila con una cuenta inexistente
+    haga fallar su bloque por la FK.
+    Devuelve las filas válidas; las descartadas se anotan en `errors`.
+    """
+    now = time.monotonic()
+    unknown_ids = {a for a in account_ids if _known_accounts.get(a, 0) <= now}
+    if not unknown_ids:
+        return rows
+    
+    found = {a for (a,) in db.query(Account.account_id).filter(Account.account_id.in_(unknown_ids))}
+    for account_id in found:
+        _known_accounts[account_id] = now + ACCOUNT_CACHE_TTL
+    if len(found) == len(unknown_ids):
+        return rows
+    
+    valid_accounts = account_ids - (unknown_ids - found)
+    
+    valid_rows = []
+    for idx, row in rows:
+        if row["account_id"] in valid_accounts:
+            valid_rows.append((idx, row))
+        else:
+            errors.add(idx, f"Account {row['account_id']} not found", row)
+    return valid_rows
+
+
+def _insert_chunk(db: Session, model, rows: List[tuple], errors: _BulkErrors, conflict_col=None) -> int:
+    """
+    Inserta `rows` ([(idx, dict)]) con un único INSERT multi-fila, sin instanciar objetos ORM.
+    Si el lote falla en la base (DBAPIError: FK inválida, valor que no cabe en la columna,
+    overflow numérico...) se reintenta fila a fila dentro de SAVEPOINTs para insertar las
+    válidas y anotar en `errors` las que fallan.
+    Con `conflict_col` los duplicados se descartan en Postgres (ON CONFLICT DO NOTHING)
+    y no cuentan como creados.
+    Devuelve las filas creadas.
+    """
+    try:
+        with db.begin_nested():
+            return len(db.execute(_insert_stmt(model, [row for _, row in rows], conflict_col)).all())
+    except DBAPIError:
+        pass
+    
+    # Duplicados ya conocidos se saltan sin pagar un SAVEPOINT + INSERT cada uno.
+    # La consulta se limita a los ids entrantes (lookup por índice, no table scan)
+    existing = set()
+    if conflict_col is not None:
+        incoming = [row[conflict_col.key] for _, row in rows if row[conflict_col.key]]
+        if incoming:
+            existing = set(db.execute(select(conflict_col).where(conflict_col.in_(incoming))).scalars().all())
+    
+    created = 0
+    for idx, row in rows:
+        if conflict_col is not None and row[conflict_col.key] in existing:
+            continue
+        try:
+            with db.begin_nested():
+                created += len(db.execute(_insert_stmt(model, [row], conflict_col)).all())
+        except DBAPIError as e:
+            errors.add(idx, e.orig, row)
+    
+    return created
+
+
+def _bulk_insert(db: Session, model, rows: List[tuple], describe, conflict_col=None) -> Tuple[int, _BulkErrors]:
+    """
+    Inserta `rows` en bloques de BULK_CHUNK_SIZE filas (ver `_insert_chunk`), todo dentro
+    de la transacción del request: el commit lo sigue haciendo el endpoint, una sola vez.
+    Un bloque con errores solo reintenta fila a fila sus propias filas.
+    Las filas cuya cuenta no existe se reportan como error antes de insertar
+    (ver `_split_unknown_accounts`).
+    Con `conflict_col`, los repetidos dentro del propio lote se descartan antes de
+    tocar la base (cuentan como saltados, igual que los duplicados ya existentes).
+    Devuelve (creadas, errores).
+    """
+    created = 0
+    errors = _BulkErrors(describe)
+    rows, account_ids = _scan_batch(rows, conflict_col.key if conflict_col is not None else None)
+    rows = _split_unknown_accounts(db, rows, account_ids, errors)
+    
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        created += _insert_chunk(db, model, rows[start:start + BULK_CHUNK_SIZE], errors, conflict_col)
+    return created, errors
 
-class CorporateActionCreate(BaseModel):
-    """Schema for creating a corporate action."""
-    account_id: int
-    asset_id: Optional[int] = None
-    ib_action_id: Optional[str] = None
-    transaction_id: Optional[str] = None
-    action_type: Optional[str] = None
-    report_date: Optional[date] = None
-    execution_date: Optional[date] = None
-    description: Optional[str] = None
-    ratio_old: Optional[Decimal] = None
-    ratio_new: Optional[Decimal] = None
-    quantity_adjustment: Optional[Decimal] = None
-    symbol: Optional[str] = None
-    isin: Optional[str] = None
-    cusip: Optional[str] = None
-    security_id: Optional[str] = None
-    security_id_type: Optional[str] = None
-    amount: Optional[Decimal] = None
-    proceeds: Optional[Decimal] = None
-    value: Optional[Decimal] = None
-    fifo_pnl_realized: Optional[Decimal] = None
-    mtm_pnl: Optional[Decimal] = None
-    currency: Optional[str] = None
-
-
-class BulkCorporateActionsRequest(BaseModel):
-    """Schema for bulk corporate actions creation."""
-    actions: List[CorporateActionCreate]
-
-
-class BulkResponse(BaseModel):
-    """Response for bulk operations."""
-    status: str
-    total: int
-    created: int
-    skipped: int
-    errors: List[dict] = []
 
 # --------------------------------------------------------------------------
 # TRADES
 # --------------------------------------------------------------------------
 @router.get("/trades", response_model=List[TradeRead])
 def read_trades(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = Query(100, le=50000, description="Maximum 50000 records per request"),
     account_id: Optional[int] = None,
-    symbol: Optional[str] = None
+    symbol: Optional[str] = Query(None, description="One or more asset symbols, comma-separated (e.g. AAPL,MSFT)"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header (preferred over skip)"),
+    after_date: Optional[date] = Query(None, description="Keyset: date of the last row already received (use with after_id)"),
+    after_id: Optional[int] = Query(None, description="Keyset: id of the last row already received")
 ):
     """
     Obtener lista de Trades. 
-    Opcional: filtrar por cuenta o asset symbol.
+    Opcional: filtrar por cuenta o por uno o varios asset symbols (separados por coma).
     Límite máximo: 50000 registros por request.
     """
+    # _paginate proyecta sobre las columnas de TradeRead: sin objetos ORM no hay
+    # lazy loads posibles (un cambio de schema no introduce un N+1 silencioso)
     query = db.query(Trades)
     
     if account_id:
         query = query.filter(Trades.account_id == account_id)
     
-    # Si quieres filtrar por símbolo, necesitas un join o subquery, 
-    # pero para mantenerlo simple y rápido, filtramos por asset_id si lo tienes, 
-    # o hacemos el join:
+    # Los símbolos se resuelven primero a sus asset_id (pocos, vía ix_assets_symbol)
+    # y Trades se filtra por el asset_id indexado, sin join contra assets
     if symbol:
-        from app.models.asset import Asset
-        query = query.join(Asset).filter(Asset.symbol == symbol)
+        symbols = [s.strip() for s in symbol.split(",") if s.strip()]
+        asset_ids = [a for (a,) in db.query(Asset.asset_id).filter(Asset.symbol.in_(symbols))]
+        query = query.filter(Trades.asset_id.in_(asset_ids))
 
     # Ordenar por fecha descendente
-    trades = query.order_by(Trades.trade_date.desc()).offset(skip).limit(limit).all()
-    return trades
+    return _paginate(query, request, _TRADES_LIST, skip, limit, cursor, after_date, after_id)
 
 @router.get("/trades/{trade_id}", response_model=TradeRead)
 def read_trade_by_id(trade_id: int, db: Session = Depends(deps.get_db)):
-    trade = db.query(Trades).filter(Trades.transaction_id == trade_id).first()
+    # lambda_stmt: el SQL compilado se cachea por el código de la lambda,
+    # trade_id entra como parámetro (sin recompilar ni recalcular cache key)
+    stmt = lambda_stmt(lambda: select(Trades).where(Trades.transaction_id == trade_id))
+    trade = db.execute(stmt).scalars().first()
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     return trade
@@ -279,11 +601,15 @@ def read_trade_by_id(trade_id: int, db: Session = Depends(deps.get_db)):
 # --------------------------------------------------------------------------
 @router.get("/cash-journal", response_model=List[CashJournalRead])
 def read_cash_journal(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = Query(100, le=50000, description="Maximum 50000 records per request"),
     account_id: Optional[int] = None,
-    type: Optional[str] = None
+    type: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header (preferred over skip)"),
+    after_date: Optional[date] = Query(None, description="Keyset: date of the last row already received (use with after_id)"),
+    after_id: Optional[int] = Query(None, description="Keyset: id of the last row already received")
 ):
     """
     Obtener movimientos de caja (Dividendos, Intereses, Fees).
@@ -296,17 +622,7 @@ def read_cash_journal(
     if type:
         query = query.filter(CashJournal.type == type)
         
-    records = query.order_by(CashJournal.date.desc()).offset(skip).limit(limit).all()
-    return records
-
-
-# Import CashJournalCreate for POST endpoints
-from app.schemas.asset import CashJournalCreate
-
-
-class BulkCashJournalRequest(BaseModel):
-    """Schema for bulk cash journal creation."""
-    entries: List[CashJournalCreate]
+    return _paginate(query, request, _CASH_JOURNAL_LIST, skip, limit, cursor, after_date, after_id)
 
 
 @router.post("/cash-journal/", response_model=CashJournalRead, status_code=201)
@@ -318,8 +634,7 @@ def create_cash_journal_entry(
     Create a single cash journal entry.
     """
     # Validate account exists
-    account = db.query(Account).filter(Account.account_id == entry_in.account_id).first()
-    if not account:
+    if not _account_exists(db, entry_in.account_id):
         raise HTTPException(status_code=404, detail=f"Account {entry_in.account_id} not found")
     
     # Check for duplicate by reference_code
@@ -332,26 +647,12 @@ def create_cash_journal_entry(
     
     # Create the entry
     try:
-        db_entry = CashJournal(
-            account_id=entry_in.account_id,
-            asset_id=entry_in.asset_id,
-            date=entry_in.date,
-            ex_date=entry_in.ex_date,
-            type=entry_in.type,
-            amount=entry_in.amount,
-            currency=entry_in.currency,
-            quantity=entry_in.quantity,
-            rate_per_share=entry_in.rate_per_share,
-            description=entry_in.description,
-            reference_code=entry_in.reference_code,
-            extra_details=entry_in.extra_details,
-            external_transaction_id=entry_in.external_transaction_id,
-            action_id=entry_in.action_id
-        )
+        # Los campos de CashJournalCreate coinciden 1:1 con las columnas
+        db_entry = CashJournal(**entry_in.model_dump())
         
         db.add(db_entry)
         db.commit()
-        db.refresh(db_entry)
+        # Sin refresh: expire_on_commit=False y la PK ya viene del INSERT ... RETURNING
         return db_entry
         
     except Exception as e:
@@ -368,56 +669,17 @@ def create_cash_journal_bulk(
     Create multiple cash journal entries in bulk.
     Skips duplicates (based on reference_code) and continues on errors.
     """
-    created_count = 0
-    skipped_count = 0
-    errors = []
+    # Duplicates (by reference_code) are resolved by Postgres through the
+    # unique constraint: ON CONFLICT DO NOTHING simply returns no row for them
+    rows = [(idx, entry_in.model_dump()) for idx, entry_in in enumerate(request.entries)]
     
-    # Get existing reference_codes to check for duplicates
-    existing_codes = set()
-    if any(e.reference_code for e in request.entries):
-        existing_entries = db.query(CashJournal.reference_code).filter(
-            CashJournal.reference_code.isnot(None)
-        ).all()
-        existing_codes = {e.reference_code for e in existing_entries}
+    created_count, errors = _bulk_insert(
+        db, CashJournal, rows,
+        describe=lambda row: {"type": row["type"], "amount": str(row["amount"]) if row["amount"] else None},
+        conflict_col=CashJournal.reference_code
+    )
     
-    for idx, entry_in in enumerate(request.entries):
-        try:
-            # Skip if duplicate
-            if entry_in.reference_code and entry_in.reference_code in existing_codes:
-                skipped_count += 1
-                continue
-            
-            db_entry = CashJournal(
-                account_id=entry_in.account_id,
-                asset_id=entry_in.asset_id,
-                date=entry_in.date,
-                ex_date=entry_in.ex_date,
-                type=entry_in.type,
-                amount=entry_in.amount,
-                currency=entry_in.currency,
-                quantity=entry_in.quantity,
-                rate_per_share=entry_in.rate_per_share,
-                description=entry_in.description,
-                reference_code=entry_in.reference_code,
-                extra_details=entry_in.extra_details,
-                external_transaction_id=entry_in.external_transaction_id,
-                action_id=entry_in.action_id
-            )
-            
-            db.add(db_entry)
-            created_count += 1
-            
-            # Add to existing set to prevent duplicates within same batch
-            if entry_in.reference_code:
-                existing_codes.add(entry_in.reference_code)
-                
-        except Exception as e:
-            errors.append({
-                "index": idx,
-                "error": str(e),
-                "type": entry_in.type,
-                "amount": str(entry_in.amount) if entry_in.amount else None
-            })
+    skipped_count = len(rows) - created_count - errors.count
     
     # Commit all at once
     try:
@@ -433,11 +695,11 @@ def create_cash_journal_bulk(
         )
     
     return BulkResponse(
-        status="success" if not errors else "partial",
+        status="success" if not errors.count else "partial",
         total=len(request.entries),
         created=created_count,
         skipped=skipped_count,
-        errors=errors[:10]
+        errors=errors.items
     )
 
 
@@ -446,10 +708,14 @@ def create_cash_journal_bulk(
 # --------------------------------------------------------------------------
 @router.get("/fx-transactions", response_model=List[FXTransactionRead])
 def read_fx_transactions(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = Query(100, le=50000, description="Maximum 50000 records per request"),
-    account_id: Optional[int] = None
+    account_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header (preferred over skip)"),
+    after_date: Optional[date] = Query(None, description="Keyset: date of the last row already received (use with after_id)"),
+    after_id: Optional[int] = Query(None, description="Keyset: id of the last row already received")
 ):
     """
     Obtener transacciones de Forex.
@@ -460,7 +726,6 @@ def read_fx_transactions(
     
     if account_id:
         # Buscar donde la cuenta sea origen O destino
-        from sqlalchemy import or_
         query = query.filter(
             or_(
                 FXTransaction.account_id == account_id,
@@ -468,18 +733,21 @@ def read_fx_transactions(
             )
         )
         
-    fxs = query.order_by(FXTransaction.trade_date.desc()).offset(skip).limit(limit).all()
-    return fxs
+    return _paginate(query, request, _FX_LIST, skip, limit, cursor, after_date, after_id)
 
 # --------------------------------------------------------------------------
 # CORPORATE ACTIONS
 # --------------------------------------------------------------------------
 @router.get("/corporate-actions", response_model=List[CorporateActionRead])
 def read_corporate_actions(
+    request: Request,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = Query(100, le=50000, description="Maximum 50000 records per request"),
-    account_id: Optional[int] = None
+    account_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header (preferred over skip)"),
+    after_date: Optional[date] = Query(None, description="Keyset: date of the last row already received (use with after_id)"),
+    after_id: Optional[int] = Query(None, description="Keyset: id of the last row already received")
 ):
     """
     Obtener acciones corporativas (Splits, Spinoffs, Mergers).
@@ -490,8 +758,7 @@ def read_corporate_actions(
     if account_id:
         query = query.filter(CorporateAction.account_id == account_id)
         
-    actions = query.order_by(CorporateAction.report_date.desc()).offset(skip).limit(limit).all()
-    return actions
+    return _paginate(query, request, _CORPORATE_ACTIONS_LIST, skip, limit, cursor, after_date, after_id)
 
 
 @router.post("/corporate-actions/", response_model=CorporateActionRead, status_code=201)
@@ -503,8 +770,7 @@ def create_corporate_action(
     Create a single corporate action.
     """
     # Validate account exists
-    account = db.query(Account).filter(Account.account_id == action_in.account_id).first()
-    if not account:
+    if not _account_exists(db, action_in.account_id):
         raise HTTPException(status_code=404, detail=f"Account {action_in.account_id} not found")
     
     # Check for duplicate (by ib_action_id if provided)
@@ -518,34 +784,12 @@ def create_corporate_action(
     
     # Create the corporate action
     try:
-        db_action = CorporateAction(
-            account_id=action_in.account_id,
-            asset_id=action_in.asset_id,
-            ib_action_id=action_in.ib_action_id,
-            transaction_id=action_in.transaction_id,
-            action_type=action_in.action_type,
-            report_date=action_in.report_date,
-            execution_date=action_in.execution_date,
-            description=action_in.description,
-            ratio_old=action_in.ratio_old,
-            ratio_new=action_in.ratio_new,
-            quantity_adjustment=action_in.quantity_adjustment,
-            symbol=action_in.symbol,
-            isin=action_in.isin,
-            cusip=action_in.cusip,
-            security_id=action_in.security_id,
-            security_id_type=action_in.security_id_type,
-            amount=action_in.amount,
-            proceeds=action_in.proceeds,
-            value=action_in.value,
-            fifo_pnl_realized=action_in.fifo_pnl_realized,
-            mtm_pnl=action_in.mtm_pnl,
-            currency=action_in.currency
-        )
+        # Los campos de CorporateActionCreate coinciden 1:1 con las columnas
+        db_action = CorporateAction(**action_in.model_dump())
         
         db.add(db_action)
         db.commit()
-        db.refresh(db_action)
+        # Sin refresh: expire_on_commit=False y la PK ya viene del INSERT ... RETURNING
         return db_action
         
     except Exception as e:
@@ -562,64 +806,17 @@ def create_corporate_actions_bulk(
     Create multiple corporate actions in bulk.
     Skips duplicates (based on ib_action_id) and continues on errors.
     """
-    created_count = 0
-    skipped_count = 0
-    errors = []
+    # Duplicates (by ib_action_id) are resolved by Postgres through the
+    # unique constraint: ON CONFLICT DO NOTHING simply returns no row for them
+    rows = [(idx, action_in.model_dump()) for idx, action_in in enumerate(request.actions)]
     
-    # Get existing ib_action_ids to check for duplicates
-    existing_ids = set()
-    if any(a.ib_action_id for a in request.actions):
-        existing_actions = db.query(CorporateAction.ib_action_id).filter(
-            CorporateAction.ib_action_id.isnot(None)
-        ).all()
-        existing_ids = {a.ib_action_id for a in existing_actions}
+    created_count, errors = _bulk_insert(
+        db, CorporateAction, rows,
+        describe=lambda row: {"description": row["description"][:100] if row["description"] else None},
+        conflict_col=CorporateAction.ib_action_id
+    )
     
-    for idx, action_in in enumerate(request.actions):
-        try:
-            # Skip if duplicate
-            if action_in.ib_action_id and action_in.ib_action_id in existing_ids:
-                skipped_count += 1
-                continue
-            
-            # Validate account exists (batch validate for efficiency)
-            db_action = CorporateAction(
-                account_id=action_in.account_id,
-                asset_id=action_in.asset_id,
-                ib_action_id=action_in.ib_action_id,
-                transaction_id=action_in.transaction_id,
-                action_type=action_in.action_type,
-                report_date=action_in.report_date,
-                execution_date=action_in.execution_date,
-                description=action_in.description,
-                ratio_old=action_in.ratio_old,
-                ratio_new=action_in.ratio_new,
-                quantity_adjustment=action_in.quantity_adjustment,
-                symbol=action_in.symbol,
-                isin=action_in.isin,
-                cusip=action_in.cusip,
-                security_id=action_in.security_id,
-                security_id_type=action_in.security_id_type,
-                amount=action_in.amount,
-                proceeds=action_in.proceeds,
-                value=action_in.value,
-                fifo_pnl_realized=action_in.fifo_pnl_realized,
-                mtm_pnl=action_in.mtm_pnl,
-                currency=action_in.currency
-            )
-            
-            db.add(db_action)
-            created_count += 1
-            
-            # Add to existing set to prevent duplicates within same batch
-            if action_in.ib_action_id:
-                existing_ids.add(action_in.ib_action_id)
-                
-        except Exception as e:
-            errors.append({
-                "index": idx,
-                "error": str(e),
-                "description": action_in.description[:100] if action_in.description else None
-            })
+    skipped_count = len(rows) - created_count - errors.count
     
     # Commit all at once
     try:
@@ -635,11 +832,11 @@ def create_corporate_actions_bulk(
         )
     
     return BulkResponse(
-        status="success" if not errors else "partial",
+        status="success" if not errors.count else "partial",
         total=len(request.actions),
         created=created_count,
         skipped=skipped_count,
-        errors=errors[:10]  # Limit errors in response
+        errors=errors.items
     )
 
 
@@ -654,8 +851,7 @@ def create_trade(
 ):
     """Create a single trade."""
     # Validate account exists
-    account = db.query(Account).filter(Account.account_id == trade_in.account_id).first()
-    if not account:
+    if not _account_exists(db, trade_in.account_id):
         raise HTTPException(status_code=404, detail=f"Account {trade_in.account_id} not found")
     
     # Check for duplicate by ib_transaction_id
@@ -667,41 +863,12 @@ def create_trade(
             return existing
     
     try:
-        db_trade = Trades(
-            account_id=trade_in.account_id,
-            asset_id=trade_in.asset_id,
-            ib_transaction_id=trade_in.ib_transaction_id,
-            ib_exec_id=trade_in.ib_exec_id,
-            ib_trade_id=trade_in.ib_trade_id,
-            ib_order_id=trade_in.ib_order_id,
-            trade_date=trade_in.trade_date,
-            settlement_date=trade_in.settlement_date,
-            report_date=trade_in.report_date,
-            transaction_type=trade_in.transaction_type,
-            side=trade_in.side,
-            exchange=trade_in.exchange,
-            quantity=trade_in.quantity,
-            price=trade_in.price,
-            gross_amount=trade_in.gross_amount,
-            net_amount=trade_in.net_amount,
-            proceeds=trade_in.proceeds,
-            commission=trade_in.commission,
-            tax=trade_in.tax,
-            cost_basis=trade_in.cost_basis,
-            realized_pnl=trade_in.realized_pnl,
-            mtm_pnl=trade_in.mtm_pnl,
-            multiplier=trade_in.multiplier,
-            strike=trade_in.strike,
-            expiry=trade_in.expiry,
-            put_call=trade_in.put_call,
-            currency=trade_in.currency,
-            description=trade_in.description,
-            notes=trade_in.notes
-        )
+        # Los campos de TradeCreate coinciden 1:1 con las columnas
+        db_trade = Trades(**trade_in.model_dump())
         
         db.add(db_trade)
         db.commit()
-        db.refresh(db_trade)
+        # Sin refresh: expire_on_commit=False y la PK ya viene del INSERT ... RETURNING
         return db_trade
         
     except Exception as e:
@@ -718,70 +885,17 @@ def create_trades_bulk(
     Create multiple trades in bulk.
     Skips duplicates (based on ib_transaction_id) and continues on errors.
     """
-    created_count = 0
-    skipped_count = 0
-    errors = []
+    # Duplicates (by ib_transaction_id) are resolved by Postgres through the
+    # unique constraint: ON CONFLICT DO NOTHING simply returns no row for them
+    rows = [(idx, trade_in.model_dump()) for idx, trade_in in enumerate(request.trades)]
     
-    # Get existing ib_transaction_ids to check for duplicates
-    existing_ids = set()
-    if any(t.ib_transaction_id for t in request.trades):
-        existing_trades = db.query(Trades.ib_transaction_id).filter(
-            Trades.ib_transaction_id.isnot(None)
-        ).all()
-        existing_ids = {t.ib_transaction_id for t in existing_trades}
+    created_count, errors = _bulk_insert(
+        db, Trades, rows,
+        describe=lambda row: {"ib_transaction_id": row["ib_transaction_id"]},
+        conflict_col=Trades.ib_transaction_id
+    )
     
-    for idx, trade_in in enumerate(request.trades):
-        try:
-            # Skip if duplicate
-            if trade_in.ib_transaction_id and trade_in.ib_transaction_id in existing_ids:
-                skipped_count += 1
-                continue
-            
-            db_trade = Trades(
-                account_id=trade_in.account_id,
-                asset_id=trade_in.asset_id,
-                ib_transaction_id=trade_in.ib_transaction_id,
-                ib_exec_id=trade_in.ib_exec_id,
-                ib_trade_id=trade_in.ib_trade_id,
-                ib_order_id=trade_in.ib_order_id,
-                trade_date=trade_in.trade_date,
-                settlement_date=trade_in.settlement_date,
-                report_date=trade_in.report_date,
-                transaction_type=trade_in.transaction_type,
-                side=trade_in.side,
-                exchange=trade_in.exchange,
-                quantity=trade_in.quantity,
-                price=trade_in.price,
-                gross_amount=trade_in.gross_amount,
-                net_amount=trade_in.net_amount,
-                proceeds=trade_in.proceeds,
-                commission=trade_in.commission,
-                tax=trade_in.tax,
-                cost_basis=trade_in.cost_basis,
-                realized_pnl=trade_in.realized_pnl,
-                mtm_pnl=trade_in.mtm_pnl,
-                multiplier=trade_in.multiplier,
-                strike=trade_in.strike,
-                expiry=trade_in.expiry,
-                put_call=trade_in.put_call,
-                currency=trade_in.currency,
-                description=trade_in.description,
-                notes=trade_in.notes
-            )
-            
-            db.add(db_trade)
-            created_count += 1
-            
-            # Add to existing set to prevent duplicates within same batch
-            if trade_in.ib_transaction_id:
-                existing_ids.add(trade_in.ib_transaction_id)
-                
-        except Exception as e:
-            errors.append({
-                "index": idx,
-                "error": str(e),
-                "ib_transaction_id": trade_in.ib_transaction_id
-            })
+    skipped_count = len(rows) - created_count - errors.count
     
     # Commit all at once
     try:
@@ -797,11 +911,11 @@ def create_trades_bulk(
         )
     
     return BulkResponse(
-        status="success" if not errors else "partial",
+        status="success" if not errors.count else "partial",
         total=len(request.trades),
         created=created_count,
         skipped=skipped_count,
-        errors=errors[:10]
+        errors=errors.items
     )
 
 
@@ -816,8 +930,7 @@ def create_fx_transaction(
 ):
     """Create a single FX transaction."""
     # Validate account exists
-    account = db.query(Account).filter(Account.account_id == fx_in.account_id).first()
-    if not account:
+    if not _account_exists(db, fx_in.account_id):
         raise HTTPException(status_code=404, detail=f"Account {fx_in.account_id} not found")
     
     # Check for duplicate by ib_transaction_id
@@ -829,30 +942,12 @@ def create_fx_transaction(
             return existing
     
     try:
-        db_fx = FXTransaction(
-            account_id=fx_in.account_id,
-            target_account_id=fx_in.target_account_id,
-            trade_date=fx_in.trade_date,
-            source_currency=fx_in.source_currency,
-            source_amount=fx_in.source_amount,
-            target_currency=fx_in.target_currency,
-            target_amount=fx_in.target_amount,
-            side=fx_in.side,
-            exchange_rate=fx_in.exchange_rate,
-            commission=fx_in.commission,
-            commission_currency=fx_in.commission_currency,
-            ib_transaction_id=fx_in.ib_transaction_id,
-            ib_exec_id=fx_in.ib_exec_id,
-            ib_order_id=fx_in.ib_order_id,
-            exchange=fx_in.exchange,
-            transaction_type=fx_in.transaction_type,
-            notes=fx_in.notes,
-            external_id=fx_in.external_id
-        )
+        # Los campos de FXTransactionCreate coinciden 1:1 con las columnas
+        db_fx = FXTransaction(**fx_in.model_dump())
         
         db.add(db_fx)
         db.commit()
-        db.refresh(db_fx)
+        # Sin refresh: expire_on_commit=False y la PK ya viene del INSERT ... RETURNING
         return db_fx
         
     except Exception as e:
@@ -869,59 +964,17 @@ def create_fx_transactions_bulk(
     Create multiple FX transactions in bulk.
     Skips duplicates (based on ib_transaction_id) and continues on errors.
     """
-    created_count = 0
-    skipped_count = 0
-    errors = []
+    # Duplicates (by ib_transaction_id) are resolved by Postgres through the
+    # unique constraint: ON CONFLICT DO NOTHING simply returns no row for them
+    rows = [(idx, fx_in.model_dump()) for idx, fx_in in enumerate(request.transactions)]
     
-    # Get existing ib_transaction_ids to check for duplicates
-    existing_ids = set()
-    if any(f.ib_transaction_id for f in request.transactions):
-        existing_fxs = db.query(FXTransaction.ib_transaction_id).filter(
-            FXTransaction.ib_transaction_id.isnot(None)
-        ).all()
-        existing_ids = {f.ib_transaction_id for f in existing_fxs}
+    created_count, errors = _bulk_insert(
+        db, FXTransaction, rows,
+        describe=lambda row: {"ib_transaction_id": row["ib_transaction_id"]},
+        conflict_col=FXTransaction.ib_transaction_id
+    )
     
-    for idx, fx_in in enumerate(request.transactions):
-        try:
-            # Skip if duplicate
-            if fx_in.ib_transaction_id and fx_in.ib_transaction_id in existing_ids:
-                skipped_count += 1
-                continue
-            
-            db_fx = FXTransaction(
-                account_id=fx_in.account_id,
-                target_account_id=fx_in.target_account_id,
-                trade_date=fx_in.trade_date,
-                source_currency=fx_in.source_currency,
-                source_amount=fx_in.source_amount,
-                target_currency=fx_in.target_currency,
-                target_amount=fx_in.target_amount,
-                side=fx_in.side,
-                exchange_rate=fx_in.exchange_rate,
-                commission=fx_in.commission,
-                commission_currency=fx_in.commission_currency,
-                ib_transaction_id=fx_in.ib_transaction_id,
-                ib_exec_id=fx_in.ib_exec_id,
-                ib_order_id=fx_in.ib_order_id,
-                exchange=fx_in.exchange,
-                transaction_type=fx_in.transaction_type,
-                notes=fx_in.notes,
-                external_id=fx_in.external_id
-            )
-            
-            db.add(db_fx)
-            created_count += 1
-            
-            # Add to existing set to prevent duplicates within same batch
-            if fx_in.ib_transaction_id:
-                existing_ids.add(fx_in.ib_transaction_id)
-                
-        except Exception as e:
-            errors.append({
-                "index": idx,
-                "error": str(e),
-                "ib_transaction_id": fx_in.ib_transaction_id
-            })
+    skipped_count = len(rows) - created_count - errors.count
     
     # Commit all at once
     try:
@@ -937,11 +990,11 @@ def create_fx_transactions_bulk(
         )
     
     return BulkResponse(
-        status="success" if not errors else "partial",
+        status="success" if not errors.count else "partial",
         total=len(request.transactions),
         created=created_count,
         skipped=skipped_count,
-        errors=errors[:10]
+        errors=errors.items
     )
 
 
@@ -949,6 +1002,26 @@ def create_fx_transactions_bulk(
 # POSITIONS - BULK OPERATIONS
 # --------------------------------------------------------------------------
 
+# Columnas que el upsert de posiciones sobreescribe (todo salvo la clave y la PK)
+_POSITION_UPSERT_COLS = [
+    c.name for c in Position.__table__.columns
+    if c.name not in ("position_id", "account_id", "asset_id", "report_date")
+]
+
+
+def _upsert_positions_stmt(rows: List[dict]):
+    """
+    INSERT ... ON CONFLICT (account_id, asset_id, report_date) DO UPDATE.
+    RETURNING xmax = 0 indica por fila si se insertó (True) o se actualizó (False).
+    """
+    stmt = pg_insert(Position.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["account_id", "asset_id", "report_date"],
+        set_={col: stmt.excluded[col] for col in _POSITION_UPSERT_COLS}
+    )
+    return stmt.returning(literal_column("xmax = 0"))
+
+
 @router.post("/positions/bulk", response_model=BulkResponse)
 def create_positions_bulk(
     request: BulkPositionsRequest,
@@ -957,72 +1030,42 @@ def create_positions_bulk(
     """
     Create or update multiple positions in bulk.
     Updates existing positions if same account_id/asset_id/report_date exists.
+    Repeated positions within the request: the last occurrence wins, and the
+    earlier ones count as updated.
     """
-    created_count = 0
-    updated_count = 0
+    # Si la misma posición viene repetida en el lote gana la última (como antes):
+    # ON CONFLICT DO UPDATE no admite tocar dos veces la misma fila en una sentencia.
+    # Las repeticiones anteriores se cuentan como `updated`, igual que cuando
+    # se aplicaban una a una sobre la fila ya existente
+    latest = {}
+    for idx, pos_in in enumerate(request.positions):
+        latest[(pos_in.account_id, pos_in.asset_id, pos_in.report_date)] = (idx, pos_in.model_dump())
+    rows = sorted(latest.values(), key=lambda r: r[0])
+    replaced_count = len(request.positions) - len(rows)
     skipped_count = 0
-    errors = []
     
-    for idx, pos_in in enumerate(request.positions):
+    errors = _BulkErrors(lambda row: {"account_id": row["account_id"], "asset_id": row["asset_id"]})
+    rows = _split_unknown_accounts(db, rows, {account_id for account_id, _, _ in latest}, errors)
+    
+    created_count = 0
+    updated_count = replaced_count
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_CHUNK_SIZE]
         try:
-            # Check for existing position (same account, asset, date)
-            existing = db.query(Position).filter(
-                Position.account_id == pos_in.account_id,
-                Position.asset_id == pos_in.asset_id,
-                Position.report_date == pos_in.report_date
-            ).first()
-            
-            if existing:
-                # Update existing position
-                existing.quantity = pos_in.quantity
-                existing.mark_price = pos_in.mark_price
-                existing.position_value = pos_in.position_value
-                existing.cost_basis_money = pos_in.cost_basis_money
-                existing.cost_basis_price = pos_in.cost_basis_price
-                existing.open_price = pos_in.open_price
-                existing.fifo_pnl_unrealized = pos_in.fifo_pnl_unrealized
-                existing.percent_of_nav = pos_in.percent_of_nav
-                existing.side = pos_in.side
-                existing.level_of_detail = pos_in.level_of_detail
-                existing.open_date_time = pos_in.open_date_time
-                existing.vesting_date = pos_in.vesting_date
-                existing.accrued_interest = pos_in.accrued_interest
-                existing.fx_rate_to_base = pos_in.fx_rate_to_base
-                existing.currency = pos_in.currency
-                
-                updated_count += 1
-            else:
-                # Create new position
-                db_position = Position(
-                    account_id=pos_in.account_id,
-                    asset_id=pos_in.asset_id,
-                    report_date=pos_in.report_date,
-                    quantity=pos_in.quantity,
-                    mark_price=pos_in.mark_price,
-                    position_value=pos_in.position_value,
-                    cost_basis_money=pos_in.cost_basis_money,
-                    cost_basis_price=pos_in.cost_basis_price,
-                    open_price=pos_in.open_price,
-                    fifo_pnl_unrealized=pos_in.fifo_pnl_unrealized,
-                    percent_of_nav=pos_in.percent_of_nav,
-                    side=pos_in.side,
-                    level_of_detail=pos_in.level_of_detail,
-                    open_date_time=pos_in.open_date_time,
-                    vesting_date=pos_in.vesting_date,
-                    accrued_interest=pos_in.accrued_interest,
-                    fx_rate_to_base=pos_in.fx_rate_to_base,
-                    currency=pos_in.currency
-                )
-                db.add(db_position)
-                created_count += 1
-                
-        except Exception as e:
-            errors.append({
-                "index": idx,
-                "error": str(e),
-                "account_id": pos_in.account_id,
-                "asset_id": pos_in.asset_id
-            })
+            with db.begin_nested():
+                inserted_flags = db.execute(_upsert_positions_stmt([row for _, row in chunk])).scalars().all()
+        except DBAPIError:
+            # Fila a fila para aislar las que fallan (asset inexistente, currency demasiado larga, etc.)
+            inserted_flags = []
+            for idx, row in chunk:
+                try:
+                    with db.begin_nested():
+                        inserted_flags.extend(db.execute(_upsert_positions_stmt([row])).scalars().all())
+                except DBAPIError as e:
+                    errors.add(idx, e.orig, row)
+        
+        created_count += sum(1 for inserted in inserted_flags if inserted)
+        updated_count += sum(1 for inserted in inserted_flags if not inserted)
     
     # Commit all at once
     try:
@@ -1039,10 +1082,10 @@ def create_positions_bulk(
         )
     
     return BulkResponse(
-        status="success" if not errors else "partial",
+        status="success" if not errors.count else "partial",
         total=len(request.positions),
         created=created_count,
         updated=updated_count,
         skipped=skipped_count,
-        errors=errors[:10]
+        errors=errors.items
     )
\ No newline at end of file
@@ -4,12 +4,14 @@ TWR (Time-Weighted Return) API Endpoints
 Provides endpoints for TWR data, sync status, recalculation, and configuration.
 """
 
+import time
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from datetime import date
 
 from app.api import deps
+from app.core.responses import FastJSONResponse, etag_json_response
 from app.schemas.twr import (
     TWRSeriesResponse,
     TWRStatusResponse,
@@ -40,26 +42,80 @@ from app.models.portfolio import TWRDaily
 
 router = APIRouter()
 
+# --------------------------------------------------------------------------
+# RESPONSE CACHE (per worker)
+# --------------------------------------------------------------------------
+# Series only change when NAVs are uploaded or TWR is recalculated, but
+# dashboards poll them constantly. Writes through this router invalidate the
+# entries of the worker that handled them; the TTL bounds how long other
+# workers can keep serving the previous values.
+# Status is not cached here: it also depends on ETLSyncStatus, which the ETL
+# updates outside this router.
+TWR_CACHE_TTL = 60  # seconds
+# The browser must revalidate (ETag) on every request, so a refetch right after
+# a recalculate / cutoff change sees the new data instead of a max-age copy
+TWR_CACHE_CONTROL = "private, no-cache"
+TWR_CACHE_MAX_ENTRIES = 2048
+# Entries hold the already-serialized JSON body: a hit is returned as-is
+_series_cache = {}  # (account_id, start_date, end_date) -> (expiry, bytes)
+
+
+def _cache_get(cache: dict, key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        cache.pop(key, None)
+        return None
+    return entry[1]
+
+
+def _cache_set(cache: dict, key, value) -> None:
+    now = time.monotonic()
+    if len(cache) >= TWR_CACHE_MAX_ENTRIES:
+        for stale in [k for k, (expiry, _) in cache.items() if expiry <= now]:
+            cache.pop(stale, None)
+        if len(cache) >= TWR_CACHE_MAX_ENTRIES:
+            cache.clear()
+    cache[key] = (now + TWR_CACHE_TTL, value)
+
+
+def _invalidate_twr_cache(account_id: Optional[int] = None) -> None:
+    """Drop cached series for one account (all accounts if None)."""
+    if account_id is None:
+        _series_cache.clear()
+    else:
+        for key in [k for k in _series_cache if k[0] == account_id]:
+            _series_cache.pop(key, None)
+
 
 @router.get("/account/{account_id}/series", response_model=TWRSeriesResponse)
 def twr_series(
     account_id: int,
+    request: Request,
     start_date: Optional[date] = Query(None, description="Override start date"),
     end_date: Optional[date] = Query(None, description="Override end date"),
     db: Session = Depends(deps.get_db),
 ):
     """Get TWR time series for a single account."""
+    cache_key = (account_id, start_date, end_date)
+    cached = _cache_get(_series_cache, cache_key)
+    if cached is not None:
+        return etag_json_response(cached, request, TWR_CACHE_CONTROL)
+
     data = get_twr_series(db, account_id, start_date=start_date, end_date=end_date)
     from app.models.portfolio import Account
     account = db.query(Account).filter(Account.account_id == account_id).first()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    return TWRSeriesResponse(
+    body = TWRSeriesResponse(
         portfolio_id=account.portfolio_id,
         cutoff_date=str(account.twr_cutoff_date) if account.twr_cutoff_date else None,
         data=data,
-    )
+    ).model_dump_json().encode()
+    _cache_set(_series_cache, cache_key, body)
+    return etag_json_response(body, request, TWR_CACHE_CONTROL)
 
 
 @router.get("/portfolio/{portfolio_id}/accounts")
@@ -69,7 +125,7 @@ def portfolio_accounts(
 ):
     """Get all USD accounts for a portfolio with their TWR info."""
     accounts = get_portfolio_usd_accounts(db, portfolio_id)
-    return {"accounts": accounts}
+    return FastJSONResponse({"accounts": accounts})
 
 
 @router.get("/portfolio/{portfolio_id}/summary")
@@ -81,7 +137,7 @@ def portfolio_twr_summary(
     Get TWR summary for a portfolio: total NAV, day change, TWR %, cutoff/last dates.
     Uses data from twr_daily table (no mock data).
     """
-    return get_portfolio_twr_summary(db, portfolio_id)
+    return FastJSONResponse(get_portfolio_twr_summary(db, portfolio_id))
 
 
 @router.get("/portfolios/summaries")
@@ -92,19 +148,21 @@ def all_portfolios_twr_summaries(
     Get TWR summaries for ALL portfolios at once.
     Used by portfolio list/cards to show real NAV and TWR data.
     """
-    return get_all_portfolios_twr_summary(db)
+    return FastJSONResponse(get_all_portfolios_twr_summary(db))
 
 
 @router.get("/{portfolio_id}/status", response_model=TWRStatusResponse)
 def twr_status(
     portfolio_id: int,
+    request: Request,
     db: Session = Depends(deps.get_db),
 ):
     """Check TWR sync status for a portfolio."""
     result = get_twr_sync_status(db, portfolio_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
-    return result
+    body = TWRStatusResponse.model_validate(result).model_dump_json().encode()
+    return etag_json_response(body, request, TWR_CACHE_CONTROL)
 
 
 @router.get("/{portfolio_id}/table", response_model=TWRTableResponse)
@@ -133,6 +191,7 @@ def twr_recalculate(
     Set debug=true to get detailed calculation logs in the server output.
     """
     result = recalculate_twr(db, account_id, debug=debug)
+    _invalidate_twr_cache(account_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
     return result
@@ -146,6 +205,7 @@ def twr_update_cutoff(
 ):
     """Update the TWR cutoff date (inception/contract date) for an account."""
     result = update_cutoff_date(db, account_id, body.cutoff_date)
+    _invalidate_twr_cache(account_id)
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
     
@@ -179,6 +239,7 @@ def twr_update_row(
 
     db.commit()
     db.refresh(row)
+    _invalidate_twr_cache(row.account_id)
 
     return {
         "message": "Row updated. Run recalculate to recompute TWR.",
@@ -195,11 +256,14 @@ def twr_upsert_nav_batch_endpoint(
     db: Session = Depends(deps.get_db),
 ):
     """Bulk upsert NAV values into twr_daily. Used by the NLV_HISTORY ETL processor."""
-    rows = [
+    # Generator: upsert_nav_batch consumes it chunk by chunk (no full copy of the batch)
+    rows = (
         {"account_code": r.account_code, "date": r.date, "nav": r.nav}
         for r in body.rows
-    ]
-    return upsert_nav_batch(db, rows)
+    )
+    result = upsert_nav_batch(db, rows)
+    _invalidate_twr_cache()
+    return result
 
 
 @router.post("/fill-and-calculate", response_model=TWRFillAndCalculateResponse)
@@ -211,6 +275,7 @@ def twr_fill_and_calculate_endpoint(
     Call this after uploading NAV data via upsert-nav-batch.
     """
     result = fill_cash_and_calculate(db)
+    _invalidate_twr_cache()
     return TWRFillAndCalculateResponse(
         message="Fill and calculate completed",
         cash_journal_filled=result["cash_journal_filled"],
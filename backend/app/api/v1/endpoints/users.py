@@ -1,6 +1,10 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from psycopg2.errorcodes import UNIQUE_VIOLATION
+from pydantic import TypeAdapter
+from sqlalchemy import exists, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from app.api import deps
 from app.core.security import get_password_hash
 
@@ -10,6 +14,58 @@ from app.schemas.user import UserRead, UserCreate, UserUpdate
 
 router = APIRouter()
 
+# Roles son datos de referencia estáticos: name -> role_id cacheado por worker.
+# Solo se cachean los roles encontrados (si aún no existe se sigue consultando).
+_role_ids = {}
+
+
+def _role_id(db: Session, name: str) -> Optional[int]:
+    role_id = _role_ids.get(name)
+    if role_id is None:
+        role_id = db.query(Role.role_id).filter(Role.name == name).scalar()
+        if role_id is not None:
+            _role_ids[name] = role_id
+    return role_id
+
+
+# Listados: las filas se leen en lotes (yield_per) y se validan/serializan a JSON
+# directamente con pydantic-core, sin la lista intermedia de ORM ni la segunda
+# pasada de validación del response_model.
+USERS_FETCH_BATCH = 50
+_users_adapter = TypeAdapter(List[UserRead])
+
+
+def _users_response(query) -> Response:
+    users = _users_adapter.validate_python(query.yield_per(USERS_FETCH_BATCH), from_attributes=True)
+    return Response(content=_users_adapter.dump_json(users), media_type="application/json")
+
+
+def _user_response(user: User, status_code: int = status.HTTP_200_OK) -> Response:
+    # Igual que los listados: una validación + dump_json, sin pasar otra vez por response_model
+    body = UserRead.model_validate(user, from_attributes=True).model_dump_json()
+    return Response(content=body, media_type="application/json", status_code=status_code)
+
+
+def _unique_violation(e: IntegrityError, user_in) -> HTTPException:
+    """
+    Traduce una violación de unicidad a un 400 legible. El constraint violado
+    viene en el diagnóstico de psycopg2 (sin parsear str(e)); cualquier otro
+    error de integridad se relanza tal cual.
+    """
+    if getattr(e.orig, "pgcode", None) != UNIQUE_VIOLATION:
+        raise e
+    constraint = e.orig.diag.constraint_name or ""
+    if "tax_id" in constraint:
+        detail = f"El Tax ID {user_in.tax_id} ya está registrado."
+    elif "username" in constraint:
+        detail = f"El username '{user_in.username}' ya está en uso."
+    elif "email" in constraint:
+        detail = f"El email '{user_in.email}' ya está registrado."
+    else:
+        detail = "Error de integridad: Un campo único ya existe."
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
 @router.get("/", response_model=List[UserRead])
 def get_users_list(
     db: Session = Depends(deps.get_db),
@@ -20,8 +76,8 @@ def get_users_list(
     Lista todos los usuarios registrados en la base de datos.
     Soporta paginación básica.
     """
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    # UserRead serializa `role`: se carga en una sola consulta IN en vez de una por usuario
+    return _users_response(db.query(User).options(selectinload(User.role)).offset(skip).limit(limit))
 
 
 @router.get("/investors", response_model=List[UserRead])
@@ -33,15 +89,14 @@ def get_investors(
     """
     Lista usuarios con rol INVESTOR.
     """
-    investor_role = db.query(Role).filter(Role.name == "INVESTOR").first()
-    if not investor_role:
+    investor_role_id = _role_id(db, "INVESTOR")
+    if investor_role_id is None:
         return []
     
-    investors = db.query(User).filter(
-        User.role_id == investor_role.role_id,
+    return _users_response(db.query(User).options(selectinload(User.role)).filter(
+        User.role_id == investor_role_id,
         User.is_active == True
-    ).order_by(User.full_name).offset(skip).limit(limit).all()
-    return investors
+    ).order_by(User.full_name).offset(skip).limit(limit))
 
 
 @router.get("/advisors", response_model=List[UserRead])
@@ -53,15 +108,14 @@ def get_advisors(
     """
     Lista usuarios con rol ADVISOR.
     """
-    advisor_role = db.query(Role).filter(Role.name == "ADVISOR").first()
-    if not advisor_role:
+    advisor_role_id = _role_id(db, "ADVISOR")
+    if advisor_role_id is None:
         return []
     
-    advisors = db.query(User).filter(
-        User.role_id == advisor_role.role_id,
+    return _users_response(db.query(User).options(selectinload(User.role)).filter(
+        User.role_id == advisor_role_id,
         User.is_active == True
-    ).order_by(User.full_name).offset(skip).limit(limit).all()
-    return advisors
+    ).order_by(User.full_name).offset(skip).limit(limit))
 
 
 @router.get("/{user_id}", response_model=UserRead)
@@ -72,13 +126,13 @@ def get_user_by_id(
     """
     Obtiene un usuario específico por su ID.
     """
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = db.query(User).options(selectinload(User.role)).filter(User.user_id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Usuario con ID {user_id} no encontrado"
         )
-    return user
+    return _user_response(user)
 
 @router.post("/", response_model=UserRead, status_code=status.HTTP_201_CREATED)
 def create_user(
@@ -89,25 +143,33 @@ def create_user(
     Crea un nuevo usuario en el sistema.
     Válida que el email y username sean únicos.
     """
-    # Validar que el email no exista
-    existing_user = db.query(User).filter(User.email == user_in.email).first()
-    if existing_user:
+    # El hash (~100 ms de CPU con bcrypt cost 12) se calcula antes de la primera
+    # consulta: la sesión todavía no tomó conexión del pool, así que el hash no
+    # retiene una conexión de Postgres. bcrypt libera el GIL, por lo que varios
+    # registros concurrentes hashean en paralelo en el threadpool.
+    password_hash = get_password_hash(user_in.password)
+    
+    # Email, username y rol se validan en un solo round-trip:
+    # SELECT EXISTS(email), EXISTS(username), EXISTS(rol)
+    email_taken, username_taken, role_exists = db.query(
+        exists().where(User.email == user_in.email),
+        exists().where(User.username == user_in.username),
+        exists().where(Role.role_id == user_in.role_id)
+    ).one()
+    
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"El email {user_in.email} ya está registrado"
         )
     
-    # Validar que el username no exista
-    existing_username = db.query(User).filter(User.username == user_in.username).first()
-    if existing_username:
+    if username_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"El username {user_in.username} ya está en uso"
         )
     
-    # Validar que el rol exista
-    role = db.query(Role).filter(Role.role_id == user_in.role_id).first()
-    if not role:
+    if not role_exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"El rol con ID {user_in.role_id} no existe"
@@ -117,7 +179,7 @@ def create_user(
     user = User(
         email=user_in.email,
         username=user_in.username,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=password_hash,
         full_name=user_in.full_name,
         phone=user_in.phone,
         tax_id=user_in.tax_id,
@@ -129,31 +191,13 @@ def create_user(
     try:
         db.add(user)
         db.commit()
-    except Exception as e:
+    except IntegrityError as e:
         db.rollback()
-        # Check for IntegrityError
-        error_msg = str(e).lower()
-        if "unique constraint" in error_msg:
-             if "tax_id" in error_msg:
-                 detail = f"El Tax ID {user_in.tax_id} ya está registrado."
-             elif "username" in error_msg:
-                 detail = f"El username '{user_in.username}' ya está en uso."
-             elif "email" in error_msg:
-                 detail = f"El email '{user_in.email}' ya está registrado."
-             else:
-                 detail = "Error de integridad: Un campo único ya existe."
-             
-             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=detail
-            )
-        else:
-            # Re-raise standard 500
-            raise e
-            
-    db.refresh(user)
+        # Carreras con otro alta (o tax_id, que no se pre-valida)
+        raise _unique_violation(e, user_in)
     
-    return user
+    # Sin refresh: created_at vuelve en el RETURNING del INSERT (eager_defaults en User)
+    return _user_response(user, status_code=status.HTTP_201_CREATED)
 
 @router.put("/{user_id}", response_model=UserRead)
 def update_user(
@@ -176,8 +220,7 @@ def update_user(
     
     # Validar email único si se está actualizando
     if user_in.email and user_in.email != user.email:
-        existing_email = db.query(User).filter(User.email == user_in.email).first()
-        if existing_email:
+        if db.query(exists().where(User.email == user_in.email)).scalar():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"El email {user_in.email} ya está registrado"
@@ -185,8 +228,7 @@ def update_user(
     
     # Validar username único si se está actualizando
     if user_in.username and user_in.username != user.username:
-        existing_username = db.query(User).filter(User.username == user_in.username).first()
-        if existing_username:
+        if db.query(exists().where(User.username == user_in.username)).scalar():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"El username {user_in.username} ya está en uso"
@@ -194,8 +236,7 @@ def update_user(
     
     # Validar que el rol exista si se está actualizando
     if user_in.role_id:
-        role = db.query(Role).filter(Role.role_id == user_in.role_id).first()
-        if not role:
+        if not db.query(exists().where(Role.role_id == user_in.role_id)).scalar():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"El rol con ID {user_in.role_id} no existe"
@@ -206,10 +247,14 @@ def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
-    
-    return user
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        # tax_id no se pre-valida y email/username pueden chocar con otra edición
+        raise _unique_violation(e, user_in)
+    # Sin refresh: expire_on_commit=False y User no tiene columnas onupdate del servidor
+    return _user_response(user)
 
 @router.delete("/{user_id}", status_code=status.HTTP_200_OK)
 def delete_user(
@@ -220,15 +265,18 @@ def delete_user(
     Realiza un soft delete marcando is_active=False.
     No elimina físicamente el usuario de la base de datos.
     """
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    # Soft delete en un solo UPDATE ... RETURNING (sin SELECT previo ni hidratar el ORM)
+    user = db.execute(
+        update(User)
+        .where(User.user_id == user_id)
+        .values(is_active=False)
+        .returning(User.full_name)
+    ).first()
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Usuario con ID {user_id} no encontrado"
         )
-    
-    # Soft delete
-    user.is_active = False
     db.commit()
     
     return {
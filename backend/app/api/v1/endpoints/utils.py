@@ -12,16 +12,16 @@ def test_db_connection(db: Session = Depends(get_db)) -> Any:
     Prueba de conectividad a la base de datos (Migrado de tu código original).
     """
     try:
-        # Usamos la sesión inyectada 'db', ya no creamos el engine aquí
-        result = db.execute(text("SELECT * FROM users"))
-        # Mapeamos el resultado a dict (igual que tu código original)
-        users = [dict(row._mapping) for row in result]
+        # Usamos la sesión inyectada 'db', ya no creamos el engine aquí.
+        # COUNT(*) + una muestra chica: no se trae la tabla entera (ni password_hash)
+        users_count = db.execute(text("SELECT COUNT(*) FROM users")).scalar()
+        sample = db.execute(text("SELECT user_id, email, full_name FROM users LIMIT 5")).mappings().all()
         
         return {
             "status": "success", 
             "message": "Conexión exitosa a WealthRoad DB", 
-            "users_count": len(users),
-            "sample_data": users
+            "users_count": users_count,
+            "sample_data": [dict(m) for m in sample]
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,4 +10,11 @@ class Settings(BaseSettings):
     class Config:
         case_sensitive = True
 
-settings = Settings()
\ No newline at end of file
+
+@lru_cache
+def get_settings() -> Settings:
+    """Settings construidos una sola vez; usable como Depends(get_settings)."""
+    return Settings()
+
+
+settings = get_settings()
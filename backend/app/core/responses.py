@@ -0,0 +1,30 @@
+import hashlib
+from typing import Any
+
+import pydantic_core
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse que serializa con el encoder de pydantic-core (Rust) en vez de
+    json.dumps de la stdlib. Mismo JSON compacto en UTF-8; soporta de forma nativa
+    date/datetime/Decimal/UUID si algún endpoint devuelve esos tipos sin pasar
+    por un response_model.
+    """
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+def etag_json_response(body: bytes, request: Request, cache_control: str = "private, no-cache") -> Response:
+    """
+    Respuesta JSON ya serializada con ETag (hash del cuerpo). Si el If-None-Match
+    del cliente coincide responde 304 sin cuerpo: la consulta y el dump se hacen
+    igual, pero el cliente (p.ej. el preload del ETL) no descarga ni parsea nada.
+    """
+    etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
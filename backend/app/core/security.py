@@ -1,12 +1,30 @@
-from passlib.context import CryptContext
+import os
 
-# Configuración de hashing (bcrypt es el estándar de la industria)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import bcrypt
+
+# Configuración de hashing (bcrypt es el estándar de la industria).
+# Se llama directo a la extensión C de bcrypt: con un solo esquema, la capa de
+# passlib (identify, deprecations, parseo de config) era puro overhead por llamada.
+# Los hashes ya guardados por passlib ($2b$, 12 rounds) verifican igual.
+# hashpw/checkpw liberan el GIL mientras calculan: los endpoints síncronos que los
+# llaman (login, register, alta de usuarios) ya hashean en paralelo en el
+# threadpool de AnyIO, un hash por core, sin necesidad de un pool de procesos.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt solo usa los primeros 72 bytes (passlib truncaba igual, en silencio)
+_BCRYPT_MAX_BYTES = 72
+
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:_BCRYPT_MAX_BYTES]
 
 def get_password_hash(password: str) -> str:
     """Transforma una contraseña plana en un hash seguro para la DB."""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si una contraseña coincide con el hash guardado."""
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    try:
+        return bcrypt.checkpw(_encode(plain_password), hashed_password.encode("ascii"))
+    except ValueError:
+        # Hash vacío o con formato inválido: nunca coincide
+        return False
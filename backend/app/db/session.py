@@ -5,5 +5,31 @@ import os
 # Obtener la URL de la base de datos del entorno o usar la de Docker por defecto
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:securepassword123@db:5432/wealthroad")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+# Pool de conexiones compartido por toda la app (API + jobs).
+# pool_pre_ping descarta conexiones muertas (reinicios de Postgres) y
+# pool_recycle evita reutilizar conexiones más viejas que 30 min.
+# executemany (flush de varios db.add(), inserts con lista de dicts) se agrupa
+# en INSERT ... VALUES multi-fila de hasta 1000 filas, y los UPDATE/DELETE
+# en lotes con execute_batch de psycopg2, en vez de un round-trip por fila.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    executemany_mode="values_plus_batch",
+    insertmanyvalues_page_size=1000,
+    executemany_batch_page_size=500,
+    # Cache de SQL compilado (default 500 entradas): la API + jobs tienen más
+    # variantes de consultas que eso y cada miss vuelve a compilar la sentencia.
+    query_cache_size=1200,
+)
+# expire_on_commit=False: tras el commit los objetos conservan lo que se acaba
+# de escribir (+ la PK del RETURNING), sin un SELECT extra al acceder a ellos.
+# autoflush=False: una consulta en medio de un loop de db.add() no dispara un
+# flush de lo pendiente; se escribe todo junto en el commit (o en un flush explícito).
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
@@ -5,47 +5,146 @@ Handles authentication and API requests to the WealthNavigator backend.
 """
 
 import logging
+import os
+import threading
+import time
+import pydantic_core
 import requests
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from app.jobs.config import API_ENDPOINTS, BACKEND_API_BASE
+from app.jobs.cache import LRUCache
+from app.jobs.config import API_ENDPOINTS, BACKEND_API_BASE, API_POOL_MAXSIZE, API_MAX_CONCURRENCY, API_CACHE_DIR
 
 logger = logging.getLogger("ETL.api_client")
 
+# Max rows read by preload_accounts/preload_assets; a shorter list means the
+# cache holds the complete list
+PRELOAD_LIMIT = 10000
+# Rows per GET while preloading: only one page of parsed JSON is held at a time
+PRELOAD_PAGE_SIZE = 1000
+# A complete preload is reused (and treated as authoritative) for this long;
+# the global client lives across ETL runs, so it must not be trusted forever
+PRELOAD_TTL = 600  # seconds
+# Symbols per request in prefetch_asset_symbols (keeps the query string short)
+SYMBOL_BATCH_SIZE = 200
+# Max entries per lookup cache (assets use up to 3 keys each: symbol/isin/conid)
+CACHE_MAXSIZE = 50_000
+# get() default that tells "not cached" apart from a cached miss (None)
+_MISSING = object()
+
+
+class _WriteSafeRetry(Retry):
+    """
+    Retry policy for the backend session. Methods outside `allowed_methods`
+    (POST/PUT/DELETE) are retried only when the request cannot have been
+    applied:
+    - connection errors (urllib3 retries those for every method: nothing was sent);
+    - 429 / 503 answers (rate limited / not accepting requests).
+    A read timeout or a 500/502/504 may come after the backend committed, so
+    writes are never replayed on those.
+    """
+    
+    WRITE_RETRY_STATUSES = frozenset([429, 503])
+    
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() not in self.allowed_methods:
+            return status_code in self.WRITE_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
 
 class APIClient:
     """
     Client for interacting with the WealthNavigator backend API.
     """
     
-    def __init__(self, base_url: str = None, timeout: int = 30):
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: int = 30,
+        cache_size: int = CACHE_MAXSIZE,
+        cache_dir: Optional[str] = API_CACHE_DIR
+    ):
+        self._urls: Dict[str, str] = {}  # endpoint path -> full URL for the current base_url
         self.base_url = base_url or BACKEND_API_BASE
         self.timeout = timeout
         self.session = self._create_session()
         
-        # Cache for frequently looked up data
-        self._account_cache: Dict[str, int] = {}  # account_code -> account_id
-        self._asset_cache: Dict[str, int] = {}    # symbol -> asset_id
+        # Cache for frequently looked up data. A None value is a cached miss
+        # (the API answered and the code/symbol does not exist).
+        # Both are LRU-bounded so a long-lived worker does not grow them forever.
+        self._account_cache: Dict[str, Optional[int]] = LRUCache(cache_size)  # account_code -> account_id
+        self._asset_cache: Dict[str, Optional[int]] = LRUCache(cache_size)    # symbol -> asset_id
+        # time.monotonic() of the last complete preload (None = not loaded)
+        self._accounts_loaded_at: Optional[float] = None
+        self._assets_loaded_at: Optional[float] = None
+        # Page ETags of the last complete preload per list endpoint; a later
+        # preload first revalidates them (If-None-Match) and keeps the cache on 304
+        self._etags: Dict[str, List[Optional[str]]] = {}
+        # Where complete preloads are shared with other processes (None = in-process only)
+        self.cache_dir: Optional[Path] = Path(cache_dir) if cache_dir else None
+        # Last symbol resolved by get_asset_id_by_symbol: CSVs come sorted by
+        # symbol, so consecutive rows usually repeat it (skips the LRU lookup).
+        # One (symbol, asset_id) tuple, replaced in a single assignment: the client
+        # is shared across threads and must never pair a symbol with another's id
+        self._last_asset: Optional[Tuple[str, int]] = None
+    
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+    
+    @base_url.setter
+    def base_url(self, value: str):
+        # The ETL can repoint the client (api_base_url); rebuild the URLs lazily
+        self._base_url = value
+        self._urls.clear()
+    
+    def _url(self, endpoint: str) -> str:
+        """Full URL for an endpoint path, built once per path (the set of paths is small and fixed)."""
+        url = self._urls.get(endpoint)
+        if url is None:
+            url = self._urls[endpoint] = self._base_url + endpoint
+        return url
     
     def _create_session(self) -> requests.Session:
         """Create a session with retry logic."""
         session = requests.Session()
         
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
+        # GET is retried on 429/5xx and on lost responses. Writes are NOT fully
+        # idempotent: ib_transaction_id is nullable and ON CONFLICT never fires on
+        # NULL, so replaying a bulk POST the backend already committed would insert
+        # its key-less rows twice. See _WriteSafeRetry for what writes retry on.
+        retry_strategy = _WriteSafeRetry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Default pool is 10 connections per host: callers sharing the global client
+        # from several threads would queue on it. pool_block=False opens an extra
+        # (non-pooled) connection instead of waiting when the pool is exhausted.
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=API_POOL_MAXSIZE,
+            pool_block=False,
+            max_retries=retry_strategy
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
+        # The backend gzips responses over 1 KB (GZipMiddleware) and urllib3
+        # decompresses transparently; requests already asks for gzip, but the
+        # preloads depend on it, so it is pinned here
         session.headers.update({
             "Content-Type": "application/json",
-            "Accept": "application/json"
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
         })
         
         return session
@@ -60,24 +159,31 @@ class APIClient:
         """
         Make an API request with error handling.
         """
-        url = f"{self.base_url}{endpoint}"
+        url = self._url(endpoint)
+        
+        # JSON encode/decode with pydantic-core (Rust) instead of the stdlib json
+        # that requests uses for json=/.json(): bulk payloads can be megabytes.
+        # The session already sends Content-Type: application/json.
+        body = None
+        if data is not None:
+            body = pydantic_core.to_json(data, inf_nan_mode="constants")
         
         try:
             response = self.session.request(
                 method=method,
                 url=url,
-                json=data,
+                data=body,
                 params=params,
                 timeout=self.timeout
             )
             
             if response.status_code == 200 or response.status_code == 201:
-                return response.json()
+                return pydantic_core.from_json(response.content)
             elif response.status_code == 404:
                 return None
             elif response.status_code == 400:
                 # Bad request - might be duplicate
-                error_detail = response.json().get("detail", "Unknown error")
+                error_detail = pydantic_core.from_json(response.content).get("detail", "Unknown error")
                 logger.warning(f"Bad request to {endpoint}: {error_detail}")
                 return {"error": error_detail, "status_code": 400}
             else:
@@ -88,30 +194,169 @@ class APIClient:
             logger.error(f"Request failed: {e}")
             return {"error": str(e), "status_code": 0}
     
+    def post_stream(self, endpoint: str, bodies: Iterable[Dict]) -> Iterator[Optional[Dict]]:
+        """
+        POST bodies back to back on the session's kept-alive connection, yielding
+        each result as it arrives. `bodies` can be a generator: each body is built
+        only when its turn comes, so the caller never holds the whole upload.
+        """
+        for body in bodies:
+            yield self._make_request("POST", endpoint, data=body)
+    
+    def post_many(
+        self,
+        endpoint: str,
+        bodies: List[Dict],
+        max_workers: int = API_MAX_CONCURRENCY
+    ) -> List[Optional[Dict]]:
+        """
+        POST several bodies to the same endpoint with up to max_workers requests
+        in flight, so N batches cost ~N/max_workers round trips instead of N.
+        Results come back in the same order as `bodies`.
+        The requests share self.session (its pool keeps the connections alive).
+        """
+        if len(bodies) <= 1 or max_workers <= 1:
+            return list(self.post_stream(endpoint, bodies))
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(bodies))) as executor:
+            return list(executor.map(
+                lambda body: self._make_request("POST", endpoint, data=body),
+                bodies
+            ))
+    
+    def _get_page(self, endpoint: str, skip: int, etag: str = None) -> Tuple[int, Optional[List[Dict]], Optional[str]]:
+        """
+        GET one PRELOAD_PAGE_SIZE page of a list endpoint, conditional on `etag`.
+        Returns (status_code, rows, etag); rows is only set on a 200.
+        """
+        try:
+            response = self.session.get(
+                self._url(endpoint),
+                params={"skip": skip, "limit": PRELOAD_PAGE_SIZE},
+                headers={"If-None-Match": etag} if etag else None,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            logger.error(f"Request failed: {e}")
+            return 0, None, None
+        
+        if response.status_code == 200:
+            rows = pydantic_core.from_json(response.content)
+            if isinstance(rows, list):
+                return 200, rows, response.headers.get("ETag")
+        elif response.status_code != 304:
+            logger.error(f"API Error {response.status_code}: {response.text}")
+        return response.status_code, None, None
+    
+    def get_pages(self, endpoint: str, etags: List[Optional[str]] = None) -> Iterator[List[Dict]]:
+        """
+        GET a list endpoint in PRELOAD_PAGE_SIZE pages (skip/limit, up to
+        PRELOAD_LIMIT rows), yielding each page as soon as it is parsed.
+        Stops after a short page (end of the list) or on an error, so the
+        caller can tell a complete read by the last page being short.
+        The ETag of each page is appended to `etags` when given.
+        """
+        for skip in range(0, PRELOAD_LIMIT, PRELOAD_PAGE_SIZE):
+            status, page, etag = self._get_page(endpoint, skip)
+            if status != 200:
+                return
+            if etags is not None:
+                etags.append(etag)
+            yield page
+            if len(page) < PRELOAD_PAGE_SIZE:
+                return
+    
+    def _load_snapshot(self, name: str, endpoint: str, cache: LRUCache):
+        """
+        Seed a cold cache from the snapshot another process saved after its own
+        complete preload. It is only trusted after _revalidate_pages() (304 on
+        every page); otherwise the normal reload replaces it.
+        """
+        if self.cache_dir is None or endpoint in self._etags:
+            return
+        try:
+            snapshot = pydantic_core.from_json((self.cache_dir / f"{name}.json").read_bytes())
+            etags, entries = snapshot["etags"], snapshot["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        cache.clear()
+        cache.update(entries)
+        self._etags[endpoint] = etags
+    
+    def _save_snapshot(self, name: str, endpoint: str, cache: LRUCache):
+        """Write a complete preload for other processes (atomic replace, last writer wins)."""
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / f"{name}.json"
+        tmp = path.with_name(f"{name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(pydantic_core.to_json({"etags": self._etags[endpoint], "entries": cache.snapshot()}))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache snapshot {path}: {e}")
+    
+    def _revalidate_pages(self, endpoint: str) -> bool:
+        """
+        True if every page of the last complete preload of `endpoint` answers
+        304 to its ETag, i.e. the list has not changed and the cache is current.
+        Stops at the first page that changed (the caller then reloads).
+        """
+        etags = self._etags.get(endpoint)
+        if not etags or None in etags:
+            return False
+        for i, etag in enumerate(etags):
+            status, _, _ = self._get_page(endpoint, i * PRELOAD_PAGE_SIZE, etag)
+            if status != 304:
+                return False
+        return True
+    
     # ==========================================================================
     # ACCOUNT OPERATIONS
     # ==========================================================================
     
-    def get_account_by_code(self, account_code: str) -> Optional[Dict]:
-        """Get an account by its code (e.g., U16337121_USD)."""
-        # Check cache first
-        if account_code in self._account_cache:
-            return {"account_id": self._account_cache[account_code]}
+    @staticmethod
+    def _is_complete(loaded_at: Optional[float], cache: LRUCache) -> bool:
+        """A recent complete preload that the LRU has not started evicting from."""
+        return (
+            loaded_at is not None
+            and time.monotonic() - loaded_at < PRELOAD_TTL
+            and not cache.evicted
+        )
+    
+    def get_account_by_code(self, account_code: str, refresh: bool = False) -> Optional[Dict]:
+        """
+        Get an account by its code (e.g., U16337121_USD).
+        refresh=True skips the cache and always asks the API.
+        """
+        if not refresh:
+            # Check cache first (including cached misses)
+            cached = self._account_cache.get(account_code, _MISSING)
+            if cached is not _MISSING:
+                return None if cached is None else {"account_id": cached}
+            # After a complete, recent preload a miss means the account does not exist
+            if self._is_complete(self._accounts_loaded_at, self._account_cache):
+                return None
         
-        # Query API
+        # Query API filtering by code (one row instead of the full account list;
+        # use preload_accounts() to warm the cache in bulk)
         result = self._make_request(
             "GET",
             "/api/v1/accounts/",
-            params={"limit": 10000}  # Get all accounts
+            params={"account_code": account_code}
         )
         
         if result and isinstance(result, list):
-            # Update cache and find our account
+            account_id = None
             for acc in result:
                 self._account_cache[acc["account_code"]] = acc["account_id"]
+                if acc["account_code"] == account_code:
+                    account_id = acc["account_id"]
             
-            if account_code in self._account_cache:
-                return {"account_id": self._account_cache[account_code]}
+            if account_id is not None:
+                return {"account_id": account_id}
+            # Remember the miss; errors (non-list results) are not cached
+            self._account_cache[account_code] = None
         
         return None
     
@@ -124,6 +369,7 @@ class APIClient:
         """Create a new account."""
         result = self._make_request("POST", "/api/v1/accounts/", data=account_data)
         if result and "account_id" in result:
+            # Overrides a cached miss for this code
             self._account_cache[result["account_code"]] = result["account_id"]
         return result
     
@@ -141,12 +387,13 @@ class APIClient:
         """
         account_code = f"{client_account_id}_{currency}"
         
-        # Check if exists
-        account_id = self.get_account_id(account_code)
+        # Known locally: no request at all
+        account_id = self._account_cache.get(account_code)
         if account_id:
             return account_id
         
-        # Create new account
+        # Create first (1 round trip for a new account); if it already exists the
+        # API answers 400 and we fall back to the lookup below
         logger.info(f"Creating new account: {account_code}")
         new_account = self.create_account({
             "portfolio_id": portfolio_id,
@@ -160,17 +407,27 @@ class APIClient:
         if new_account and "account_id" in new_account:
             return new_account["account_id"]
         
-        return None
+        # Created meanwhile by someone else (the preloaded cache was stale)
+        account = self.get_account_by_code(account_code, refresh=True)
+        return account.get("account_id") if account else None
     
     # ==========================================================================
     # ASSET OPERATIONS
     # ==========================================================================
     
-    def get_asset_by_symbol(self, symbol: str) -> Optional[Dict]:
-        """Get an asset by symbol."""
+    def get_asset_by_symbol(self, symbol: str, refresh: bool = False) -> Optional[Dict]:
+        """
+        Get an asset by symbol.
+        refresh=True skips the cache and always asks the API.
+        """
         cache_key = f"symbol:{symbol}"
-        if cache_key in self._asset_cache:
-            return {"asset_id": self._asset_cache[cache_key]}
+        if not refresh:
+            cached = self._asset_cache.get(cache_key, _MISSING)
+            if cached is not _MISSING:
+                return None if cached is None else {"asset_id": cached}
+            # After a complete, recent preload a miss means the asset does not exist
+            if self._is_complete(self._assets_loaded_at, self._asset_cache):
+                return None
         
         result = self._make_request(
             "GET",
@@ -184,9 +441,39 @@ class APIClient:
                 if asset["symbol"] == symbol:
                     self._asset_cache[cache_key] = asset["asset_id"]
                     return asset
+            self._asset_cache[cache_key] = None
         
         return None
     
+    def prefetch_asset_symbols(self, symbols: Iterable[str]):
+        """
+        Resolve many symbols with one GET /assets/?symbols=... per
+        SYMBOL_BATCH_SIZE instead of one search request per symbol.
+        Hits and misses are cached, so the per-row get_asset_id calls that
+        follow are answered locally. No-op while a complete preload is fresh.
+        """
+        if self._is_complete(self._assets_loaded_at, self._asset_cache):
+            return
+        
+        unknown = sorted({
+            s for s in symbols
+            if s and "," not in s and f"symbol:{s}" not in self._asset_cache
+        })
+        for i in range(0, len(unknown), SYMBOL_BATCH_SIZE):
+            batch = unknown[i:i + SYMBOL_BATCH_SIZE]
+            result = self._make_request(
+                "GET",
+                "/api/v1/assets/",
+                params={"symbols": ",".join(batch), "limit": PRELOAD_LIMIT}
+            )
+            if not isinstance(result, list):
+                continue  # request failed: leave them to the per-symbol lookup
+            found: Dict[str, int] = {}
+            for asset in result:
+                found.setdefault(asset["symbol"], asset["asset_id"])
+            for symbol in batch:
+                self._asset_cache[f"symbol:{symbol}"] = found.get(symbol)
+    
     def get_asset_id(self, symbol: str) -> Optional[int]:
         """Get asset_id from symbol."""
         # First check the preloaded cache
@@ -201,7 +488,8 @@ class APIClient:
         """Create a new asset."""
         result = self._make_request("POST", "/api/v1/assets/", data=asset_data)
         if result and "asset_id" in result:
-            self._asset_cache[result["symbol"]] = result["asset_id"]
+            # Same key as the lookups; overrides a cached miss
+            self._asset_cache[f"symbol:{result['symbol']}"] = result["asset_id"]
         return result
     
     def get_or_create_asset(
@@ -215,12 +503,14 @@ class APIClient:
     ) -> Optional[int]:
         """
         Get asset_id or create the asset if it doesn't exist.
+        POST /assets/ already returns the existing asset when the symbol is
+        taken, so a cache miss costs one request instead of lookup + create.
         """
-        asset_id = self.get_asset_id(symbol)
+        asset_id = self.get_asset_id_by_symbol(symbol)
         if asset_id:
             return asset_id
         
-        logger.info(f"Creating new asset: {symbol}")
+        logger.info(f"Get-or-create asset: {symbol}")
         new_asset = self.create_asset({
             "symbol": symbol,
             "description": description or symbol,
@@ -234,7 +524,9 @@ class APIClient:
         if new_asset and "asset_id" in new_asset:
             return new_asset["asset_id"]
         
-        return None
+        # Created meanwhile by someone else (the preloaded cache was stale)
+        asset = self.get_asset_by_symbol(symbol, refresh=True)
+        return asset.get("asset_id") if asset else None
     
     # ==========================================================================
     # CORPORATE ACTIONS
@@ -305,6 +597,14 @@ class APIClient:
         )
         return result or {"status": "error", "created": 0, "skipped": 0, "errors": []}
     
+    def create_trades_bulk_many(self, batches: List[List[Dict]]) -> List[Dict]:
+        """Send several trade batches concurrently (see post_many)."""
+        results = self.post_many(
+            "/api/v1/transactions/trades/bulk",
+            [{"trades": trades} for trades in batches]
+        )
+        return [r or {"status": "error", "created": 0, "skipped": 0, "errors": []} for r in results]
+    
     # ==========================================================================
     # FX TRANSACTIONS
     # ==========================================================================
@@ -326,6 +626,14 @@ class APIClient:
         )
         return result or {"status": "error", "created": 0, "skipped": 0, "errors": []}
     
+    def create_fx_transactions_bulk_many(self, batches: List[List[Dict]]) -> List[Dict]:
+        """Send several FX batches concurrently (see post_many)."""
+        results = self.post_many(
+            "/api/v1/transactions/fx-transactions/bulk",
+            [{"transactions": transactions} for transactions in batches]
+        )
+        return [r or {"status": "error", "created": 0, "skipped": 0, "errors": []} for r in results]
+    
     # ==========================================================================
     # POSITIONS
     # ==========================================================================
@@ -356,7 +664,7 @@ class APIClient:
         result = self._make_request(
             "GET",
             "/api/v1/portfolios/",
-            params={"limit": 1000}
+            params={"interface_code": interface_code}
         )
         
         if result and isinstance(result, list):
@@ -400,46 +708,106 @@ class APIClient:
         """Clear all internal caches."""
         self._account_cache.clear()
         self._asset_cache.clear()
+        self._accounts_loaded_at = None
+        self._assets_loaded_at = None
+        self._etags.clear()
+        self._last_asset = None
+    
+    def bootstrap_caches(self):
+        """
+        Load accounts and assets once at the start of a job. Processors still
+        call preload_*(), which become no-ops while this load is fresh.
+        A cache left by a previous run is revalidated (304 = kept as is)
+        instead of downloaded again.
+        """
+        self._accounts_loaded_at = None
+        self._assets_loaded_at = None
+        self.preload_accounts()
+        self.preload_assets()
     
     def preload_accounts(self):
-        """Preload all accounts into cache."""
-        result = self._make_request(
-            "GET",
-            "/api/v1/accounts/",
-            params={"limit": 10000}
-        )
+        """Preload all accounts into cache (skipped while a previous load is fresh)."""
+        if self._is_complete(self._accounts_loaded_at, self._account_cache):
+            return
         
-        if result and isinstance(result, list):
-            for acc in result:
-                self._account_cache[acc["account_code"]] = acc["account_id"]
+        endpoint = "/api/v1/accounts/"
+        self._load_snapshot("accounts", endpoint, self._account_cache)
+        if not self._account_cache.evicted and self._revalidate_pages(endpoint):
+            self._accounts_loaded_at = time.monotonic()
+            logger.info(f"Accounts cache unchanged (304), keeping {len(self._account_cache)} accounts")
+            return
+        
+        self._accounts_loaded_at = None
+        self._etags.pop(endpoint, None)
+        etags: List[Optional[str]] = []
+        count = 0
+        last_page_size = PRELOAD_PAGE_SIZE
+        for page in self.get_pages(endpoint, etags):
+            if count == 0:
+                # Full list: replaces whatever was cached (and resets the eviction flag)
+                self._account_cache.clear()
+            self._account_cache.update({acc["account_code"]: acc["account_id"] for acc in page})
+            count += len(page)
+            last_page_size = len(page)
+        
+        if count:
+            if last_page_size < PRELOAD_PAGE_SIZE and not self._account_cache.evicted:
+                self._accounts_loaded_at = time.monotonic()
+                self._etags[endpoint] = etags
+                self._save_snapshot("accounts", endpoint, self._account_cache)
             logger.info(f"Preloaded {len(self._account_cache)} accounts into cache")
     
     def preload_assets(self):
-        """Preload all assets into cache (by symbol, isin, and conid)."""
-        result = self._make_request(
-            "GET",
-            "/api/v1/assets/",
-            params={"limit": 10000}
-        )
+        """
+        Preload all assets into cache (by symbol, isin, and conid).
+        Skipped while a previous load is fresh.
+        """
+        if self._is_complete(self._assets_loaded_at, self._asset_cache):
+            return
         
-        if result and isinstance(result, list):
-            for asset in result:
-                asset_id = asset["asset_id"]
-                # Cache by symbol
-                if asset.get("symbol"):
-                    self._asset_cache[f"symbol:{asset['symbol']}"] = asset_id
-                # Cache by ISIN
-                if asset.get("isin"):
-                    self._asset_cache[f"isin:{asset['isin']}"] = asset_id
-                # Cache by conid
-                if asset.get("ib_conid"):
-                    self._asset_cache[f"conid:{asset['ib_conid']}"] = asset_id
-            logger.info(f"Preloaded {len(result)} assets into cache")
+        endpoint = "/api/v1/assets/"
+        self._load_snapshot("assets", endpoint, self._asset_cache)
+        if not self._asset_cache.evicted and self._revalidate_pages(endpoint):
+            self._assets_loaded_at = time.monotonic()
+            logger.info("Assets cache unchanged (304), keeping the previous preload")
+            return
+        
+        self._assets_loaded_at = None
+        self._etags.pop(endpoint, None)
+        etags: List[Optional[str]] = []
+        count = 0
+        last_page_size = PRELOAD_PAGE_SIZE
+        for page in self.get_pages(endpoint, etags):
+            if count == 0:
+                # Full list: replaces whatever was cached (and resets the eviction flag)
+                self._asset_cache.clear()
+                self._last_asset = None
+            # Cache by symbol, ISIN and conid (one dict.update per key type)
+            for prefix, field in (("symbol", "symbol"), ("isin", "isin"), ("conid", "ib_conid")):
+                self._asset_cache.update({
+                    f"{prefix}:{asset[field]}": asset["asset_id"]
+                    for asset in page if asset.get(field)
+                })
+            count += len(page)
+            last_page_size = len(page)
+        
+        if count:
+            if last_page_size < PRELOAD_PAGE_SIZE and not self._asset_cache.evicted:
+                self._assets_loaded_at = time.monotonic()
+                self._etags[endpoint] = etags
+                self._save_snapshot("assets", endpoint, self._asset_cache)
+            logger.info(f"Preloaded {count} assets into cache")
     
     def get_asset_id_by_symbol(self, symbol: str) -> Optional[int]:
         """Get asset_id from symbol."""
-        cache_key = f"symbol:{symbol}"
-        return self._asset_cache.get(cache_key)
+        last = self._last_asset
+        if last is not None and last[0] == symbol:
+            return last[1]
+        asset_id = self._asset_cache.get(f"symbol:{symbol}")
+        if asset_id is not None:
+            # Only hits are kept in the slot (a miss may be created right after)
+            self._last_asset = (symbol, asset_id)
+        return asset_id
     
     def get_asset_id_by_isin(self, isin: str) -> Optional[int]:
         """Get asset_id from ISIN."""
@@ -452,13 +820,18 @@ class APIClient:
         return self._asset_cache.get(cache_key)
 
 
-# Global client instance
+# Global client instance. One APIClient (and one requests.Session) is shared
+# by every worker thread: issuing requests through a Session is thread-safe,
+# and a single urllib3 pool keeps keep-alive connections reusable.
 _client: Optional[APIClient] = None
+_client_lock = threading.Lock()
 
 
 def get_api_client() -> APIClient:
     """Get or create the global API client instance."""
     global _client
     if _client is None:
-        _client = APIClient()
+        with _client_lock:
+            if _client is None:
+                _client = APIClient()
     return _client
@@ -0,0 +1,79 @@
+"""
+ETL Caches - Bounded lookup caches shared by the API and DB clients
+====================================================================
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(OrderedDict):
+    """
+    Dict bounded to `maxsize` entries: reads and writes refresh a key, and
+    inserting past the limit drops the least recently used one. `evicted`
+    records that something was dropped, i.e. the cache no longer holds a
+    complete preload.
+    
+    Thread-safe: the global APIClient is shared by every ETL job thread, and a
+    read also reorders the dict (move_to_end), so every operation holds the
+    lock. It is reentrant because OrderedDict.update/setdefault call back into
+    __setitem__/__getitem__.
+    """
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.evicted = False
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+    
+    def get(self, key, default=None):
+        # One locked lookup (not `key in self` + self[key]: a concurrent
+        # clear/eviction in between would raise KeyError)
+        with self._lock:
+            try:
+                value = super().__getitem__(key)
+            except KeyError:
+                return default
+            self.move_to_end(key)
+            return value
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self:
+                self.move_to_end(key)
+            super().__setitem__(key, value)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+                self.evicted = True
+    
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+    
+    def pop(self, key, *default):
+        with self._lock:
+            return super().pop(key, *default)
+    
+    def setdefault(self, key, default=None):
+        with self._lock:
+            return super().setdefault(key, default)
+    
+    def update(self, *args, **kwargs):
+        with self._lock:
+            super().update(*args, **kwargs)
+    
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self.evicted = False
+    
+    def snapshot(self) -> dict:
+        """Plain dict copy taken under the lock (iterating while another thread writes would fail)."""
+        with self._lock:
+            return dict(super().items())
@@ -12,9 +12,18 @@ BASE_DIR = Path(__file__).resolve().parent
 DOWNLOAD_DIR = BASE_DIR / "downloads"
 PROCESSED_DIR = BASE_DIR / "processed"
 
-# Ensure directories exist
-DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+
+def ensure_dirs() -> None:
+    """
+    Create the download/processed directories if missing.
+
+    Called by the ETL entrypoints that write files instead of at import
+    time, so importing this module (e.g. from the API) does no filesystem
+    work.
+    """
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+
 
 # --- IBKR FLEX QUERY CONFIGURATION ---
 IBKR_TOKEN = os.getenv("IBKR_TOKEN", "181787535917845028470530")
@@ -39,8 +48,15 @@ IBKR_INITIATE_URL = "https://www.interactivebrokers.com/Universal/servlet/FlexSt
 IBKR_DOWNLOAD_URL = "https://www.interactivebrokers.com/Universal/servlet/FlexStatementService.GetStatement"
 
 # --- TIMING ---
-WAIT_FOR_GENERATION = 3  # seconds to wait for report generation
-WAIT_BETWEEN_FILES = 2   # seconds between file downloads
+WAIT_FOR_GENERATION = 3  # seconds to wait for report generation (first poll)
+WAIT_BETWEEN_FILES = 2   # seconds between report requests
+# GetStatement polls per report while IBKR is still generating it (the wait
+# doubles each time: 3s, 6s, 12s, 24s)
+IBKR_MAX_POLLS = 4
+# Flex error codes worth polling again: 1018 too many requests, 1019 generation in progress
+IBKR_RETRY_CODES = {"1018", "1019"}
+# Reports downloaded at once (IBKR rate-limits Flex requests per token)
+IBKR_MAX_PARALLEL = int(os.getenv("IBKR_MAX_PARALLEL", "3"))
 
 # --- FILE MANAGEMENT ---
 # Auto-delete CSV files after successful processing to save disk space
@@ -56,6 +72,16 @@ MONEDAS_SUPPORTED = [
 # --- BACKEND API CONFIGURATION ---
 # When running inside Docker, use service name. Outside Docker, use localhost.
 BACKEND_API_BASE = os.getenv("BACKEND_API_BASE", "http://localhost:8000")
+# Keep-alive connections per host kept by the APIClient session (all calls go
+# to the same backend host, so pool_maxsize is the effective concurrency cap)
+API_POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", "64"))
+# Bulk batches in flight at once in APIClient.post_many (bounded so one ETL run
+# does not take over the backend's worker threads / DB pool)
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "4"))
+# Shared snapshot of the APIClient preload caches (accounts/assets + page ETags).
+# ETL runs in other worker processes start from it and only revalidate (304)
+# instead of downloading the lists again. Empty string disables it.
+API_CACHE_DIR = os.getenv("API_CACHE_DIR", str(BASE_DIR / "cache"))
 
 # API Endpoints
 API_ENDPOINTS = {
@@ -5,16 +5,84 @@ Uses SQLAlchemy directly instead of HTTP calls to avoid deadlocks.
 """
 
 import logging
-from typing import Dict, Optional, List
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional, List, Iterable
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal
 from app.models.portfolio import Account, Portfolio
 from app.models.asset import Asset, CorporateAction
+from app.jobs.cache import LRUCache
 from app.jobs.config import DEFAULT_EQUITY_CLASS_ID
 
 logger = logging.getLogger("ETL.db_client")
 
+# Rows per fetch when preloading (server-side cursor): the preloads read only
+# the id/key columns and never hold the whole table as ORM objects
+PRELOAD_FETCH_SIZE = 10000
+
+# Bounds of the DBClient caches (the global client lives for the whole process).
+# The asset index holds up to 3 keys per asset; an evicted entry is just queried again.
+ASSET_CACHE_MAXSIZE = 200_000
+# Misses are arbitrary CSV strings, so they are bounded separately
+MISS_CACHE_MAXSIZE = 50_000
+
+# Key prefixes of DBClient._asset_index
+SYMBOL_KEY = "S:"
+ISIN_KEY = "I:"
+DESCRIPTION_KEY = "D:"
+
+# Corporate action fields by conversion (see _prepare_corporate_action_data)
+CA_DATE_FIELDS = ('report_date', 'execution_date')
+CA_DECIMAL_FIELDS = (
+    'ratio_old', 'ratio_new', 'quantity_adjustment',
+    'amount', 'proceeds', 'value', 'fifo_pnl_realized', 'mtm_pnl'
+)
+CA_OTHER_FIELDS = (
+    'account_id', 'asset_id', 'ib_action_id', 'transaction_id',
+    'action_type', 'description', 'symbol', 'isin', 'cusip',
+    'security_id', 'security_id_type', 'currency'
+)
+
+
+def _to_date(val: Any) -> Optional[date]:
+    """ISO string or date -> date; anything else (or unparseable) -> None."""
+    if val is None:
+        return None
+    if isinstance(val, str):
+        try:
+            return date.fromisoformat(val)
+        except ValueError:
+            return None
+    return val if isinstance(val, date) else None
+
+
+def _to_decimal(val: Any) -> Optional[Decimal]:
+    """str/int/float/Decimal -> exact Decimal (floats via str); anything else -> None."""
+    if val is None:
+        return None
+    if isinstance(val, Decimal):
+        return val
+    if isinstance(val, str):
+        try:
+            return Decimal(val)
+        except InvalidOperation:
+            return None
+    if isinstance(val, (int, float)):
+        return Decimal(str(val))
+    return None
+
+
+# (field, coercer) for every converted field, resolved once at import: the
+# per-row code is one comprehension with a single call per field
+CA_COERCERS = (
+    tuple((field, _to_date) for field in CA_DATE_FIELDS)
+    + tuple((field, _to_decimal) for field in CA_DECIMAL_FIELDS)
+)
+
 
 class DBClient:
     """
@@ -22,16 +90,28 @@ class DBClient:
     Avoids HTTP calls that cause deadlocks when running inside the same server.
     """
     
-    def __init__(self, db: Session = None):
+    def __init__(
+        self,
+        db: Session = None,
+        asset_cache_size: int = ASSET_CACHE_MAXSIZE,
+        miss_cache_size: int = MISS_CACHE_MAXSIZE
+    ):
         self._db = db
         self._owns_session = False
         
         # Cache for frequently looked up data
+        # Account caches stay plain dicts: bounded by the accounts table, and the
+        # base-code map is only complete as preloaded (it is never refilled by lookups)
         self._account_cache: Dict[str, int] = {}  # account_code -> account_id
         self._account_base_cache: Dict[str, int] = {}  # base account_code (without currency suffix) -> account_id
-        self._asset_cache: Dict[str, int] = {}    # symbol -> asset_id
-        self._asset_isin_cache: Dict[str, int] = {}  # isin -> asset_id
-        self._asset_description_cache: Dict[str, int] = {}  # description (lowercase) -> asset_id
+        # Single asset index with tagged keys: "S:<symbol>", "I:<ISIN upper>",
+        # "D:<description lower>" -> asset_id (one dict, one probe per candidate)
+        self._asset_index: Dict[str, int] = LRUCache(asset_cache_size)
+        # Known misses (already queried, not found): not queried again in this run
+        # (LRU-bounded; used as sets: key -> None)
+        self._account_misses = LRUCache(miss_cache_size)      # account codes with no account
+        self._security_id_misses = LRUCache(miss_cache_size)  # security_id with no isin/symbol/description match
+        self._symbol_misses = LRUCache(miss_cache_size)       # symbols with no asset
     
     @property
     def db(self) -> Session:
@@ -53,6 +133,14 @@ class DBClient:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
     
+    def _scalar_id(self, id_col, criterion) -> Optional[int]:
+        """
+        First id matching `criterion` (SELECT id ... LIMIT 1): a scalar instead
+        of a hydrated ORM object. The statement shape is fixed per call site, so
+        the engine's compiled cache serves it after the first call.
+        """
+        return self.db.execute(select(id_col).where(criterion).limit(1)).scalar()
+    
     # ==========================================================================
     # ACCOUNT OPERATIONS
     # ==========================================================================
@@ -69,37 +157,41 @@ class DBClient:
         # Check base code cache (for codes without currency suffix)
         if account_code in self._account_base_cache:
             return self._account_base_cache[account_code]
+        if account_code in self._account_misses:
+            return None
         
         # Query DB - exact match
-        account = self.db.query(Account).filter(
-            Account.account_code == account_code
-        ).first()
+        account_id = self._scalar_id(Account.account_id, Account.account_code == account_code)
         
-        if account:
-            self._account_cache[account_code] = account.account_id
-            return account.account_id
+        if account_id:
+            self._account_cache[account_code] = account_id
+            return account_id
         
         # Try base code (remove currency suffix if present)
         base_code = account_code.split('_')[0]
         if base_code != account_code and base_code in self._account_base_cache:
             return self._account_base_cache[base_code]
         
+        self._account_misses[account_code] = None
         return None
     
     def preload_accounts(self):
-        """Preload all accounts into cache."""
-        accounts = self.db.query(Account).all()
-        for acc in accounts:
+        """Preload all accounts into cache (only the two columns used, streamed)."""
+        rows = self.db.execute(
+            select(Account.account_id, Account.account_code)
+            .execution_options(yield_per=PRELOAD_FETCH_SIZE)
+        )
+        for account_id, account_code in rows:
             # Cache full account code
-            self._account_cache[acc.account_code] = acc.account_id
+            self._account_cache[account_code] = account_id
             
             # Also cache base code (without currency suffix)
             # If account code has format U12345678_USD, cache U12345678
-            if '_' in acc.account_code:
-                base_code = acc.account_code.split('_')[0]
+            if '_' in account_code:
+                base_code = account_code.split('_')[0]
                 # Only cache if not already present (use first occurrence)
                 if base_code not in self._account_base_cache:
-                    self._account_base_cache[base_code] = acc.account_id
+                    self._account_base_cache[base_code] = account_id
         
         logger.info(
             f"Preloaded {len(self._account_cache)} accounts into cache "
@@ -116,17 +208,21 @@ class DBClient:
             return None
             
         # Check cache first
-        if symbol in self._asset_cache:
-            return self._asset_cache[symbol]
+        asset_id = self._asset_index.get(SYMBOL_KEY + symbol)
+        if asset_id is not None:
+            return asset_id
+        if symbol in self._symbol_misses:
+            return None
         
         # Query DB - exact match only (no cleaning)
         # Options like "AAPL  260220C00265000" must be stored as-is
-        asset = self.db.query(Asset).filter(Asset.symbol == symbol).first()
+        asset_id = self._scalar_id(Asset.asset_id, Asset.symbol == symbol)
         
-        if asset:
-            self._asset_cache[symbol] = asset.asset_id
-            return asset.asset_id
+        if asset_id:
+            self._asset_index[SYMBOL_KEY + symbol] = asset_id
+            return asset_id
         
+        self._symbol_misses[symbol] = None
         return None
     
     def get_asset_id_flexible(
@@ -154,77 +250,141 @@ class DBClient:
         # Try security_id based searches first
         if security_id:
             security_id_clean = security_id.strip()
-            security_id_upper = security_id_clean.upper()
-            security_id_lower = security_id_clean.lower()
-            
-            # 1. Try ISIN cache first
-            if security_id_upper in self._asset_isin_cache:
-                return self._asset_isin_cache[security_id_upper]
-            
-            # 2. Try symbol cache with security_id
-            if security_id_clean in self._asset_cache:
-                return self._asset_cache[security_id_clean]
             
-            # 3. Try description cache (case-insensitive)
-            if security_id_lower in self._asset_description_cache:
-                return self._asset_description_cache[security_id_lower]
+            # 1-3. ISIN, symbol and description (case-insensitive) in the cache
+            asset_id = self._cached_security_id(security_id_clean)
+            if asset_id is not None:
+                return asset_id
             
-            # If not in cache, query DB directly
-            # Try ISIN
-            asset = self.db.query(Asset).filter(Asset.isin == security_id_upper).first()
-            if asset:
-                self._asset_isin_cache[security_id_upper] = asset.asset_id
-                return asset.asset_id
-            
-            # Try symbol with security_id
-            asset = self.db.query(Asset).filter(Asset.symbol == security_id_clean).first()
-            if asset:
-                self._asset_cache[security_id_clean] = asset.asset_id
-                return asset.asset_id
-            
-            # Try description (case-insensitive)
-            asset = self.db.query(Asset).filter(
-                Asset.description.ilike(security_id_clean)
-            ).first()
-            if asset:
-                self._asset_description_cache[security_id_lower] = asset.asset_id
-                return asset.asset_id
+            # If not in cache (and not a known miss), query DB directly
+            if security_id_clean not in self._security_id_misses:
+                # Try ISIN
+                security_id_upper = security_id_clean.upper()
+                asset_id = self._scalar_id(Asset.asset_id, Asset.isin == security_id_upper)
+                if asset_id:
+                    self._asset_index[ISIN_KEY + security_id_upper] = asset_id
+                    return asset_id
+                
+                # Try symbol with security_id
+                asset_id = self._scalar_id(Asset.asset_id, Asset.symbol == security_id_clean)
+                if asset_id:
+                    self._asset_index[SYMBOL_KEY + security_id_clean] = asset_id
+                    return asset_id
+                
+                # Try description (case-insensitive)
+                asset_id = self._scalar_id(Asset.asset_id, Asset.description.ilike(security_id_clean))
+                if asset_id:
+                    self._asset_index[DESCRIPTION_KEY + security_id_clean.lower()] = asset_id
+                    return asset_id
+                
+                self._security_id_misses[security_id_clean] = None
         
         # 4. FALLBACK: Try CSV symbol against DB symbol
         if symbol:
             symbol_clean = symbol.strip()
             
             # Check symbol cache
-            if symbol_clean in self._asset_cache:
-                return self._asset_cache[symbol_clean]
+            asset_id = self._asset_index.get(SYMBOL_KEY + symbol_clean)
+            if asset_id is not None:
+                return asset_id
+            if symbol_clean in self._symbol_misses:
+                return None
             
             # Query DB by symbol
-            asset = self.db.query(Asset).filter(Asset.symbol == symbol_clean).first()
-            if asset:
-                self._asset_cache[symbol_clean] = asset.asset_id
-                return asset.asset_id
+            asset_id = self._scalar_id(Asset.asset_id, Asset.symbol == symbol_clean)
+            if asset_id:
+                self._asset_index[SYMBOL_KEY + symbol_clean] = asset_id
+                return asset_id
+            self._symbol_misses[symbol_clean] = None
         
         return None
     
+    def _cached_security_id(self, security_id: str) -> Optional[int]:
+        """A (stripped) security_id resolved from the cache: as ISIN, then symbol, then description."""
+        index = self._asset_index
+        asset_id = index.get(ISIN_KEY + security_id.upper())
+        if asset_id is None:
+            asset_id = index.get(SYMBOL_KEY + security_id)
+            if asset_id is None:
+                asset_id = index.get(DESCRIPTION_KEY + security_id.lower())
+        return asset_id
+    
+    def prefetch_assets(self, security_ids: Iterable[str] = (), symbols: Iterable[str] = ()):
+        """
+        Resolve many rows' assets with ONE query before a per-row loop of
+        get_asset_id / get_asset_id_flexible, instead of up to 3 SELECTs per row:
+        
+            SELECT asset_id, symbol, isin, lower(description) FROM assets
+            WHERE isin IN (...) OR symbol IN (...) OR lower(description) IN (...)
+        
+        Fills the asset index and records the values that matched nothing as
+        misses, so the per-row calls become dict lookups.
+        """
+        index = self._asset_index
+        security_ids = {
+            s for s in (s.strip() for s in security_ids if s)
+            if s and self._cached_security_id(s) is None and s not in self._security_id_misses
+        }
+        symbols = {
+            s for s in (s.strip() for s in symbols if s)
+            if s and SYMBOL_KEY + s not in index and s not in self._symbol_misses
+        }
+        if not security_ids and not symbols:
+            return
+        
+        isins = {s.upper() for s in security_ids}
+        descriptions = {s.lower() for s in security_ids}
+        candidate_symbols = security_ids | symbols
+        
+        rows = self.db.execute(
+            select(Asset.asset_id, Asset.symbol, Asset.isin, func.lower(Asset.description))
+            .where(or_(
+                Asset.isin.in_(isins),
+                Asset.symbol.in_(candidate_symbols),
+                func.lower(Asset.description).in_(descriptions)
+            ))
+        ).all()
+        
+        for asset_id, symbol, isin, description in rows:
+            if isin in isins:
+                index.setdefault(ISIN_KEY + isin, asset_id)
+            if symbol in candidate_symbols:
+                index.setdefault(SYMBOL_KEY + symbol, asset_id)
+            if description in descriptions:
+                index.setdefault(DESCRIPTION_KEY + description, asset_id)
+        
+        self._security_id_misses.update(dict.fromkeys(s for s in security_ids if self._cached_security_id(s) is None))
+        self._symbol_misses.update(dict.fromkeys(s for s in symbols if SYMBOL_KEY + s not in index))
+        
+        logger.info(f"Prefetched {len(rows)} assets for {len(security_ids)} security ids / {len(symbols)} symbols")
+    
     def preload_assets(self):
-        """Preload all assets into caches (symbol, isin, description)."""
-        assets = self.db.query(Asset).all()
-        for asset in assets:
+        """Preload all assets into the index (symbol, isin, description); scalar columns, streamed."""
+        rows = self.db.execute(
+            select(Asset.asset_id, Asset.symbol, Asset.isin, Asset.description)
+            .execution_options(yield_per=PRELOAD_FETCH_SIZE)
+        )
+        index = self._asset_index
+        symbols = isins = descriptions = 0
+        for asset_id, symbol, isin, description in rows:
             # Cache by symbol
-            if asset.symbol:
-                self._asset_cache[asset.symbol] = asset.asset_id
+            if symbol:
+                index[SYMBOL_KEY + symbol] = asset_id
+                symbols += 1
             
             # Cache by ISIN (uppercase)
-            if asset.isin:
-                self._asset_isin_cache[asset.isin.upper()] = asset.asset_id
+            if isin:
+                index[ISIN_KEY + isin.upper()] = asset_id
+                isins += 1
             
             # Cache by description (lowercase for case-insensitive matching)
-            if asset.description:
-                self._asset_description_cache[asset.description.lower()] = asset.asset_id
+            if description:
+                index[DESCRIPTION_KEY + description.lower()] = asset_id
+                descriptions += 1
         
         logger.info(
-            f"Preloaded {len(self._asset_cache)} assets into cache "
-            f"({len(self._asset_isin_cache)} ISINs, {len(self._asset_description_cache)} descriptions)"
+            f"Preloaded {symbols} assets into cache "
+            f"({isins} ISINs, {descriptions} descriptions)"
         )
     
     def create_asset(
@@ -250,7 +410,11 @@ class DBClient:
             self.db.add(asset)
             self.db.flush()  # Get the ID without committing
             
-            self._asset_cache[symbol] = asset.asset_id
+            self._asset_index[SYMBOL_KEY + symbol] = asset.asset_id
+            self._symbol_misses.pop(symbol, None)
+            for value in (symbol, isin):
+                if value:
+                    self._security_id_misses.pop(value, None)
             logger.info(f"Created new asset: {symbol} (ID: {asset.asset_id})")
             return asset.asset_id
             
@@ -291,69 +455,26 @@ class DBClient:
         Prepare corporate action data for database insertion.
         Converts string dates to date objects and string decimals to Decimal.
         """
-        from datetime import date as date_type
-        from decimal import Decimal
-        
-        prepared = {}
-        
-        # Date fields
-        date_fields = ['report_date', 'execution_date']
-        for field in date_fields:
-            val = action_data.get(field)
-            if val is not None:
-                if isinstance(val, str):
-                    try:
-                        prepared[field] = date_type.fromisoformat(val)
-                    except ValueError:
-                        prepared[field] = None
-                elif isinstance(val, date_type):
-                    prepared[field] = val
-                else:
-                    prepared[field] = None
-            else:
-                prepared[field] = None
-        
-        # Decimal fields
-        decimal_fields = [
-            'ratio_old', 'ratio_new', 'quantity_adjustment',
-            'amount', 'proceeds', 'value', 'fifo_pnl_realized', 'mtm_pnl'
-        ]
-        for field in decimal_fields:
-            val = action_data.get(field)
-            if val is not None:
-                if isinstance(val, str):
-                    try:
-                        prepared[field] = Decimal(val)
-                    except Exception:
-                        prepared[field] = None
-                elif isinstance(val, (int, float)):
-                    prepared[field] = Decimal(str(val))
-                elif isinstance(val, Decimal):
-                    prepared[field] = val
-                else:
-                    prepared[field] = None
-            else:
-                prepared[field] = None
+        get = action_data.get
+        prepared = {field: coerce(get(field)) for field, coerce in CA_COERCERS}
         
         # Copy other fields as-is
-        other_fields = [
-            'account_id', 'asset_id', 'ib_action_id', 'transaction_id',
-            'action_type', 'description', 'symbol', 'isin', 'cusip',
-            'security_id', 'security_id_type', 'currency'
-        ]
-        for field in other_fields:
-            if field in action_data:
-                prepared[field] = action_data[field]
+        prepared.update((field, action_data[field]) for field in CA_OTHER_FIELDS if field in action_data)
         
         return prepared
     
     def create_corporate_action(self, action_data: Dict) -> Optional[int]:
-        """Create a corporate action and return its ID."""
+        """
+        Create a corporate action and return its ID.
+        The flush runs in a SAVEPOINT: if it fails only this row is rolled back
+        and the session stays usable (a failed flush would otherwise leave the
+        whole transaction aborted until an explicit rollback).
+        """
         try:
             prepared = self._prepare_corporate_action_data(action_data)
             action = CorporateAction(**prepared)
-            self.db.add(action)
-            self.db.flush()
+            with self.db.begin_nested():
+                self.db.add(action)
             return action.action_id
         except Exception as e:
             logger.error(f"Failed to create corporate action: {e}")
@@ -363,20 +484,40 @@ class DBClient:
         """
         Create multiple corporate actions.
         Returns summary of successes and failures.
+        
+        Rows are prepared up front (rows that fail are reported, not inserted)
+        and written with one Core INSERT executemany on the table: no ORM
+        objects, identity map or unit of work; the engine sends it as
+        multi-row VALUES pages.
+        Rows whose ib_action_id already exists are skipped by the database
+        (ON CONFLICT DO NOTHING) instead of failing and rolling back the batch.
         """
-        created = 0
+        rows = []
         errors = []
         
         for i, action_data in enumerate(actions):
             try:
-                prepared = self._prepare_corporate_action_data(action_data)
-                action = CorporateAction(**prepared)
-                self.db.add(action)
-                created += 1
+                rows.append(self._prepare_corporate_action_data(action_data))
             except Exception as e:
                 errors.append({"index": i, "error": str(e)})
         
+        created = 0
         try:
+            if rows:
+                # executemany needs the same keys in every row (missing ones are
+                # NULL, as with the ORM: the table has no column defaults)
+                keys = set().union(*rows)
+                stmt = (
+                    pg_insert(CorporateAction.__table__)
+                    .on_conflict_do_nothing(index_elements=[CorporateAction.ib_action_id])
+                    .returning(CorporateAction.action_id)
+                )
+                # RETURNING gives one row per inserted action (rowcount is not
+                # reliable for a paged executemany)
+                created = len(self.db.execute(
+                    stmt,
+                    [{key: row.get(key) for key in keys} for row in rows]
+                ).all())
             self.db.commit()
         except Exception as e:
             self.db.rollback()
@@ -392,7 +533,7 @@ class DBClient:
             "status": "success" if not errors else "partial",
             "total": len(actions),
             "created": created,
-            "skipped": len(errors),
+            "skipped": len(actions) - created,
             "errors": errors
         }
     
@@ -404,9 +545,22 @@ class DBClient:
         """Clear all internal caches."""
         self._account_cache.clear()
         self._account_base_cache.clear()
-        self._asset_cache.clear()
-        self._asset_isin_cache.clear()
-        self._asset_description_cache.clear()
+        self._asset_index.clear()
+        self._account_misses.clear()
+        self._security_id_misses.clear()
+        self._symbol_misses.clear()
+    
+    def cache_info(self) -> Dict[str, int]:
+        """Entries per cache (for monitoring a long-lived client)."""
+        return {
+            "accounts": len(self._account_cache),
+            "account_base_codes": len(self._account_base_cache),
+            "asset_keys": len(self._asset_index),
+            "asset_keys_max": self._asset_index.maxsize,
+            "account_misses": len(self._account_misses),
+            "security_id_misses": len(self._security_id_misses),
+            "symbol_misses": len(self._symbol_misses),
+        }
     
     def commit(self):
         """Commit the current transaction."""
@@ -5,12 +5,18 @@ Downloads CSV reports using the IBKR Flex Query API.
 """
 
 import os
+import re
 import time
 import logging
 import requests
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import Dict, Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.jobs.config import (
     IBKR_TOKEN,
@@ -20,11 +26,42 @@ from app.jobs.config import (
     IBKR_DOWNLOAD_URL,
     WAIT_FOR_GENERATION,
     WAIT_BETWEEN_FILES,
+    IBKR_MAX_POLLS,
+    IBKR_RETRY_CODES,
+    IBKR_MAX_PARALLEL,
     DOWNLOAD_DIR
 )
 
 logger = logging.getLogger("ETL.downloader")
 
+# Bytes per read/write when streaming a report to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Fields of a FlexStatementResponse (flat, fixed schema)
+FLEX_RESPONSE_FIELDS = ("Status", "ReferenceCode", "ErrorCode", "ErrorMessage")
+_FLEX_FIELD_RE = re.compile(rb"<(Status|ReferenceCode|ErrorCode|ErrorMessage)>([^<]*)</\1>")
+
+
+def _parse_flex_response(content: bytes) -> Dict[str, str]:
+    """
+    Status/ReferenceCode/ErrorCode/ErrorMessage of a FlexStatementResponse.
+    The payload is tiny and flat, so a regex reads it without building an
+    element tree; anything unexpected (no <Status>) goes through ElementTree,
+    which raises ET.ParseError on malformed XML.
+    """
+    fields = {}
+    for name, value in _FLEX_FIELD_RE.findall(content):
+        fields.setdefault(name.decode(), unescape(value.decode()))
+    if "Status" in fields:
+        return fields
+    
+    root = ET.fromstring(content)
+    for name in FLEX_RESPONSE_FIELDS:
+        element = root.find(name)
+        if element is not None and element.text is not None:
+            fields[name] = element.text
+    return fields
+
 
 class IBKRDownloader:
     """
@@ -36,9 +73,44 @@ class IBKRDownloader:
         self.output_dir = output_dir or DOWNLOAD_DIR
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        self.session = self._create_session()
+        
         self.downloaded_files: List[Path] = []
         self.errors: List[Dict] = []
     
+    def _create_session(self) -> requests.Session:
+        """
+        Keep-alive session shared by every SendRequest/GetStatement call (and by
+        the download threads): one TLS handshake with ibkr.com instead of one
+        per request. Transient HTTP errors are retried with backoff.
+        """
+        session = requests.Session()
+        retry_strategy = Retry(
+            total=5,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(IBKR_MAX_PARALLEL, 1),
+            max_retries=retry_strategy
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def close(self):
+        """Close the HTTP session."""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
     def get_reference_code(self, query_id: str, query_name: str) -> Optional[str]:
         """
         Request a report from IBKR and get the reference code for download.
@@ -56,21 +128,19 @@ class IBKRDownloader:
         logger.info(f"[{query_name}] Requesting report (Query ID: {query_id})...")
         
         try:
-            response = requests.get(IBKR_INITIATE_URL, params=params, timeout=30)
+            response = self.session.get(IBKR_INITIATE_URL, params=params, timeout=30)
             response.raise_for_status()
             
-            root = ET.fromstring(response.content)
-            status = root.find("Status").text
+            fields = _parse_flex_response(response.content)
+            status = fields.get("Status")
             
             if status == "Success":
-                ref_code = root.find("ReferenceCode").text
+                ref_code = fields.get("ReferenceCode")
                 logger.info(f"[{query_name}] Request accepted. Reference Code: {ref_code}")
                 return ref_code
             else:
-                error_code = root.find("ErrorCode")
-                error_msg = root.find("ErrorMessage")
-                code = error_code.text if error_code is not None else "?"
-                msg = error_msg.text if error_msg is not None else "No message"
+                code = fields.get("ErrorCode", "?")
+                msg = fields.get("ErrorMessage", "No message")
                 logger.error(f"[{query_name}] Request failed. Code: {code} | Message: {msg}")
                 self.errors.append({
                     "query": query_name,
@@ -94,6 +164,8 @@ class IBKRDownloader:
     def download_csv(self, ref_code: str, filename: str) -> Optional[Path]:
         """
         Download the CSV report using the reference code.
+        Polls GetStatement while IBKR is still generating the report
+        (waits WAIT_FOR_GENERATION, then doubles it, up to IBKR_MAX_POLLS tries).
         """
         params = {
             "t": self.token,
@@ -101,36 +173,52 @@ class IBKRDownloader:
             "v": IBKR_API_VERSION
         }
         
-        logger.info(f"Waiting {WAIT_FOR_GENERATION}s for report generation...")
-        time.sleep(WAIT_FOR_GENERATION)
-        
-        try:
-            response = requests.get(IBKR_DOWNLOAD_URL, params=params, timeout=60)
-            response.raise_for_status()
-            content = response.content
-            
-            # Check if response is an error XML
-            if content.strip().startswith(b"<FlexStatementResponse"):
-                root = ET.fromstring(content)
-                if root.find("Status").text == "Fail":
-                    error_msg = root.find("ErrorMessage").text
-                    logger.error(f"Download failed (API Error): {error_msg}")
-                    self._create_empty_file(filename)
-                    return None
-            
-            # Save the CSV
-            file_path = self.output_dir / f"{filename}.csv"
-            with open(file_path, "wb") as f:
-                f.write(content)
+        delay = WAIT_FOR_GENERATION
+        for attempt in range(1, IBKR_MAX_POLLS + 1):
+            logger.info(f"[{filename}] Waiting {delay}s for report generation...")
+            time.sleep(delay)
+            delay *= 2
             
-            logger.info(f"✅ File saved: {filename}.csv ({len(content)} bytes)")
-            self.downloaded_files.append(file_path)
-            return file_path
-            
-        except requests.RequestException as e:
-            logger.error(f"Download error for {filename}: {e}")
-            self._create_empty_file(filename)
-            return None
+            try:
+                # Streamed: the report is written to disk chunk by chunk instead of
+                # being held whole in memory (Flex CSVs can be hundreds of MB)
+                with self.session.get(IBKR_DOWNLOAD_URL, params=params, timeout=60, stream=True) as response:
+                    response.raise_for_status()
+                    chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+                    first = next(chunks, b"")
+                    
+                    # Check if response is an error XML (small: read the rest of it)
+                    if first.lstrip().startswith(b"<FlexStatementResponse"):
+                        content = first + b"".join(chunks)
+                        fields = _parse_flex_response(content)
+                        code = fields.get("ErrorCode")
+                        if code in IBKR_RETRY_CODES and attempt < IBKR_MAX_POLLS:
+                            logger.info(f"[{filename}] Report not ready yet (code {code}), polling again")
+                            continue
+                        if fields.get("Status") != "Success" or code in IBKR_RETRY_CODES:
+                            error_msg = fields.get("ErrorMessage", "No message")
+                            logger.error(f"Download failed (API Error): {error_msg}")
+                            self._create_empty_file(filename)
+                            return None
+                        chunks = iter(())
+                        first = content
+                    
+                    # Save the CSV
+                    file_path = self.output_dir / f"{filename}.csv"
+                    size = 0
+                    with open(file_path, "wb") as f:
+                        for chunk in chain((first,), chunks):
+                            f.write(chunk)
+                            size += len(chunk)
+                
+                logger.info(f"✅ File saved: {filename}.csv ({size} bytes)")
+                self.downloaded_files.append(file_path)
+                return file_path
+                
+            except requests.RequestException as e:
+                logger.error(f"Download error for {filename}: {e}")
+                self._create_empty_file(filename)
+                return None
     
     def _create_empty_file(self, filename: str):
         """Create an empty placeholder file for failed downloads."""
@@ -154,6 +242,11 @@ class IBKRDownloader:
         """
         Download all configured reports.
         Returns a dict mapping query name to file path.
+        
+        Reports are downloaded concurrently (up to IBKR_MAX_PARALLEL at once):
+        the time is mostly IBKR generating each statement, so the total is close
+        to the slowest report instead of the sum. Requests are still started
+        WAIT_BETWEEN_FILES apart to stay under IBKR's rate limit.
         """
         queries = queries or FLEX_QUERIES
         results = {}
@@ -166,14 +259,18 @@ class IBKRDownloader:
             logger.error("IBKR_TOKEN not configured!")
             return results
         
-        for name, query_id in queries.items():
-            file_path = self.download_report(name, query_id)
+        futures = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(IBKR_MAX_PARALLEL, len(queries)))) as executor:
+            for i, (name, query_id) in enumerate(queries.items()):
+                # Wait between requests to avoid rate limiting
+                if i:
+                    time.sleep(WAIT_BETWEEN_FILES)
+                futures[name] = executor.submit(self.download_report, name, query_id)
+        
+        for name, future in futures.items():
+            file_path = future.result()
             if file_path:
                 results[name] = file_path
-            
-            # Wait between downloads to avoid rate limiting
-            if name != list(queries.keys())[-1]:  # Don't wait after last file
-                time.sleep(WAIT_BETWEEN_FILES)
         
         logger.info("=" * 50)
         logger.info(f"DOWNLOAD COMPLETE: {len(results)}/{len(queries)} reports")
@@ -207,8 +304,8 @@ def download_ibkr_reports(
     Returns:
         Dict mapping query names to downloaded file paths
     """
-    downloader = IBKRDownloader(token=token, output_dir=output_dir)
-    return downloader.download_all_reports(queries)
+    with IBKRDownloader(token=token, output_dir=output_dir) as downloader:
+        return downloader.download_all_reports(queries)
 
 
 if __name__ == "__main__":
@@ -23,7 +23,7 @@ logging.basicConfig(
 logger = logging.getLogger("ETL")
 
 # Import ETL components
-from app.jobs.config import DOWNLOAD_DIR, FLEX_QUERIES
+from app.jobs.config import DOWNLOAD_DIR, FLEX_QUERIES, ensure_dirs
 from app.jobs.downloader import IBKRDownloader, download_ibkr_reports
 from app.jobs.api_client import get_api_client
 from app.jobs.processors.corporate_actions import CorporateActionsProcessor
@@ -79,6 +79,7 @@ class ETLOrchestrator:
             Summary of the ETL run
         """
         self.results["started_at"] = datetime.now().isoformat()
+        ensure_dirs()
         logger.info("=" * 60)
         logger.info("STARTING ETL PIPELINE")
         logger.info("=" * 60)
@@ -107,6 +108,10 @@ class ETLOrchestrator:
         if report_types is None:
             report_types = list(FLEX_QUERIES.keys())
         
+        # Accounts/assets are loaded once for the whole run; the processors'
+        # own preload calls reuse this load instead of downloading it again
+        self.api_client.bootstrap_caches()
+        
         for report_type in report_types:
             if report_type in downloaded_files:
                 self._process_report(report_type, downloaded_files[report_type])
@@ -126,8 +131,8 @@ class ETLOrchestrator:
         """Download all reports from IBKR."""
         logger.info("PHASE 1: Downloading reports from IBKR...")
         
-        downloader = IBKRDownloader(output_dir=self.download_dir)
-        return downloader.download_all_reports()
+        with IBKRDownloader(output_dir=self.download_dir) as downloader:
+            return downloader.download_all_reports()
     
     def _process_report(self, report_type: str, file_path: Path):
         """
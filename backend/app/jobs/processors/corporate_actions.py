@@ -137,6 +137,9 @@ class CorporateActionsProcessor:
         # Preload caches for efficiency via API
         self.api.preload_accounts()
         self.api.preload_assets()
+        # Symbols the preload did not cover are resolved in batches up front
+        if "Symbol" in df.columns:
+            self.api.prefetch_asset_symbols(str(s) for s in df["Symbol"].dropna())
         
         # Process each row
         actions_to_create = []
@@ -71,9 +71,12 @@ class TradesProcessor:
         self.api.preload_accounts()
         self.api.preload_assets()
         
-        # Collect trades and FX for bulk insert
+        # Collect trades and FX for bulk insert; full batches are queued and
+        # sent together at the end (several in flight at once)
         trades_to_create: List[Dict] = []
         fx_to_create: List[Dict] = []
+        trade_batches: List[List[Dict]] = []
+        fx_batches: List[List[Dict]] = []
         
         for idx, row in enumerate(rows):
             try:
@@ -99,9 +102,9 @@ class TradesProcessor:
                         })
                     elif fx_data:
                         fx_to_create.append(fx_data)
-                        # Send batch if full
+                        # Queue batch if full
                         if len(fx_to_create) >= BATCH_SIZE:
-                            self._send_fx_batch(fx_to_create)
+                            fx_batches.append(fx_to_create)
                             fx_to_create = []
                 else:
                     trade_data = self._process_trade_row(row, idx)
@@ -115,9 +118,9 @@ class TradesProcessor:
                         })
                     elif trade_data:
                         trades_to_create.append(trade_data)
-                        # Send batch if full
+                        # Queue batch if full
                         if len(trades_to_create) >= BATCH_SIZE:
-                            self._send_trades_batch(trades_to_create)
+                            trade_batches.append(trades_to_create)
                             trades_to_create = []
                     
             except Exception as e:
@@ -129,11 +132,13 @@ class TradesProcessor:
                     "error": str(e)
                 })
         
-        # Send remaining batches
+        # Send all batches (remaining partial ones included)
         if trades_to_create:
-            self._send_trades_batch(trades_to_create)
+            trade_batches.append(trades_to_create)
         if fx_to_create:
-            self._send_fx_batch(fx_to_create)
+            fx_batches.append(fx_to_create)
+        self._send_trades_batches(trade_batches)
+        self._send_fx_batches(fx_batches)
         
         logger.info(f"✅ Procesamiento completado: {self.stats}")
         
@@ -145,35 +150,39 @@ class TradesProcessor:
             "failed_records": self.failed_records[:100]  # Limit to first 100
         }
     
-    def _send_trades_batch(self, trades: List[Dict]) -> None:
-        """Send a batch of trades to the API."""
-        if not trades:
+    def _send_trades_batches(self, batches: List[List[Dict]]) -> None:
+        """Send the trade batches to the API (concurrently, see APIClient.post_many)."""
+        if not batches:
             return
         try:
-            result = self.api.create_trades_bulk(trades)
+            results = self.api.create_trades_bulk_many(batches)
+        except Exception as e:
+            logger.error(f"❌ Error sending trades batches: {e}")
+            self.stats["errors"] += sum(len(b) for b in batches)
+            return
+        for result in results:
             created = result.get("created", 0)
             updated = result.get("skipped", 0)  # skipped = duplicates = updated (not modified)
             self.stats["trades_created"] += created
             self.stats["trades_updated"] += updated
             logger.info(f"📤 Batch trades: {created} created, {updated} updated (duplicates)")
-        except Exception as e:
-            logger.error(f"❌ Error sending trades batch: {e}")
-            self.stats["errors"] += len(trades)
     
-    def _send_fx_batch(self, fx_list: List[Dict]) -> None:
-        """Send a batch of FX transactions to the API."""
-        if not fx_list:
+    def _send_fx_batches(self, batches: List[List[Dict]]) -> None:
+        """Send the FX batches to the API (concurrently, see APIClient.post_many)."""
+        if not batches:
             return
         try:
-            result = self.api.create_fx_transactions_bulk(fx_list)
+            results = self.api.create_fx_transactions_bulk_many(batches)
+        except Exception as e:
+            logger.error(f"❌ Error sending FX batches: {e}")
+            self.stats["errors"] += sum(len(b) for b in batches)
+            return
+        for result in results:
             created = result.get("created", 0)
             updated = result.get("skipped", 0)  # skipped = duplicates = updated (not modified)
             self.stats["fx_created"] += created
             self.stats["fx_updated"] += updated
             logger.info(f"📤 Batch FX: {created} created, {updated} updated (duplicates)")
-        except Exception as e:
-            logger.error(f"❌ Error sending FX batch: {e}")
-            self.stats["errors"] += len(fx_list)
     
     # =========================================================================
     # TRADES NORMALES
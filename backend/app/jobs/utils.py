@@ -10,6 +10,8 @@ from decimal import Decimal, InvalidOperation
 from typing import Optional, Dict, Any, Tuple
 import pandas as pd
 
+from app.jobs.config import ACTION_TYPE_MAP
+
 logger = logging.getLogger("ETL.utils")
 
 
@@ -152,8 +154,6 @@ def normalize_action_type(raw_type, description: str = "") -> str:
     """
     Normalize the corporate action type from IBKR codes.
     """
-    from app.jobs.config import ACTION_TYPE_MAP
-    
     # Convert raw_type to string and handle None/NaN
     if raw_type is None or (isinstance(raw_type, float) and pd.isna(raw_type)):
         raw_type = ""
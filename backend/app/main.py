@@ -1,11 +1,16 @@
+import os
 import time
+from anyio import to_thread
 from sqlalchemy.exc import OperationalError
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 # from sqlalchemy import text  <-- YA NO ES NECESARIO
 from app.api.v1.api import api_router
 from app.db.base import Base
 from app.api.deps import engine
+from app.core.responses import FastJSONResponse
+from app.db.session import DB_POOL_SIZE, DB_MAX_OVERFLOW
 
 # Importar modelos para que Base.metadata los reconozca y se registren los eventos
 from app.models import user, portfolio, asset 
@@ -15,7 +20,9 @@ app = FastAPI(
     description="Backend ERP de Gestión Patrimonial",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # Serialización JSON de todas las respuestas con pydantic-core (ver app/core/responses.py)
+    default_response_class=FastJSONResponse
 )
 
 # ... Configuración de CORS ...
@@ -42,8 +49,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # Paginación keyset + revalidación de listados (/transactions, /accounts, /assets)
 )
 
+# Compresión gzip de respuestas: los listados JSON repiten las mismas claves en
+# cada fila y se comprimen ~8-10x. Por debajo de 1 KB no compensa.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # --- INICIO ROBUSTO DE BASE DE DATOS ---
 @app.on_event("startup")
 def startup_event():
@@ -67,6 +79,17 @@ def startup_event():
     else:
         print("--- ❌ ERROR CRÍTICO: No se pudo conectar a la DB ---")
 
+# --- THREADPOOL DE LOS ENDPOINTS SÍNCRONOS ---
+# Los endpoints son `def` + Session síncrona: FastAPI los ejecuta en el threadpool
+# de AnyIO y cada hilo ocupa como mucho una conexión del pool. Se dimensiona según
+# el pool de la DB (más un margen para endpoints sin DB) en vez del default fijo
+# de 40: con más hilos que conexiones solo se encolan en pool_timeout, con menos
+# quedan conexiones ociosas.
+@app.on_event("startup")
+async def configure_threadpool():
+    default_size = DB_POOL_SIZE + DB_MAX_OVERFLOW + 10
+    to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("API_THREADPOOL_SIZE", default_size))
+
 # ... Conectar Rutas ...
 app.include_router(api_router, prefix="/api/v1")
 
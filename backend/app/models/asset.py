@@ -2,7 +2,7 @@ import sqlalchemy
 from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Numeric, CHAR, Text, BigInteger, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from sqlalchemy import event, DDL
+from sqlalchemy import event, DDL, Index
 from sqlalchemy.dialects.postgresql import JSONB  # <--- IMPORTANTE: Agrega esto
 
 from app.db.base import Base
@@ -56,7 +56,7 @@ class Asset(Base):
     class_id = Column(Integer, ForeignKey("asset_classes.class_id"), nullable=False)
     sub_class_id = Column(Integer, ForeignKey("asset_sub_classes.sub_class_id"))
     
-    symbol = Column(String, nullable=False) # ISIN suele usarse aquí o en isin
+    symbol = Column(String, nullable=False, index=True) # ISIN suele usarse aquí o en isin
     description = Column(String)
     isin = Column(String)
     figi = Column(String)
@@ -121,7 +121,7 @@ class Trades(Base):
     transaction_id = Column(Integer, primary_key=True, index=True)
     
     account_id = Column(Integer, ForeignKey("accounts.account_id"))
-    asset_id = Column(Integer, ForeignKey("assets.asset_id"))
+    asset_id = Column(Integer, ForeignKey("assets.asset_id"), index=True)
     
     # --- IDENTIFICADORES IBKR (Clave para conciliación) ---
     # "TransactionID": ID numérico único del movimiento (ej: 37183892878). 
@@ -239,7 +239,7 @@ class FXTransaction(Base):
     commission_currency = Column(CHAR(3), nullable=True)  # "IBCommissionCurrency"
     
     # Identificadores IBKR
-    ib_transaction_id = Column(String, index=True, nullable=True)  # "TransactionID"
+    ib_transaction_id = Column(String, unique=True, index=True, nullable=True)  # "TransactionID"
     ib_exec_id = Column(String, nullable=True)  # "IBExecID"
     ib_order_id = Column(String, nullable=True)  # "IBOrderID"
     
@@ -381,6 +381,10 @@ class Position(Base):
     fx_rate_to_base = Column(Numeric, default=1, nullable=True) # 'FXRateToBase' (T1 & T2)
     currency = Column(CHAR(3), nullable=True) # 'Currency' (T1 & T2)
 
+    # Una posición por cuenta/activo/día: el upsert de /positions/bulk hace ON CONFLICT sobre esto
+    __table_args__ = (
+        sqlalchemy.UniqueConstraint('account_id', 'asset_id', 'report_date', name='uq_positions_account_asset_date'),
+    )
 
     # Relaciones
     account = relationship("Account", back_populates="positions")
@@ -624,6 +628,19 @@ class StructuredNote(Base):
     asset = relationship("Asset")
 
 
+# Índices compuestos para los listados de /transactions (ver migración 009):
+# filtro por cuenta + orden por fecha DESC
+Index("ix_trades_account_trade_date", Trades.account_id, Trades.trade_date.desc())
+Index("ix_cash_journal_account_date", CashJournal.account_id, CashJournal.date.desc())
+Index("ix_fx_transactions_account_trade_date", FXTransaction.account_id, FXTransaction.trade_date.desc())
+Index(
+    "ix_fx_transactions_target_account_trade_date",
+    FXTransaction.target_account_id, FXTransaction.trade_date.desc(),
+    postgresql_where=FXTransaction.target_account_id.isnot(None)
+)
+Index("ix_corporate_actions_account_report_date", CorporateAction.account_id, CorporateAction.report_date.desc())
+
+
 event.listen(
     MarketPrice.__table__, 
     'after_create', 
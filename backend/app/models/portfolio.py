@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, CHAR, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, CHAR, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -114,7 +114,8 @@ class TWRDaily(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     __table_args__ = (
-        # One record per account per day
+        # One record per account per day (upsert_nav_batch does ON CONFLICT on it)
+        UniqueConstraint("account_id", "date", name="uq_twr_daily_account_date"),
         {"schema": None},
     )
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB # Necesario para Audit Logs
@@ -48,7 +48,18 @@ class User(Base):
     role = relationship("Role", back_populates="users")
     owned_portfolios = relationship("Portfolio", back_populates="owner")
     advisor_assignments = relationship("PortfolioAdvisor", back_populates="advisor")
+    
+    # created_at (server_default) se trae en el mismo INSERT ... RETURNING,
+    # sin un SELECT aparte al serializar el usuario recién creado
+    __mapper_args__ = {"eager_defaults": True}
+
 
+# Listados /users/investors y /users/advisors: rol + activos, orden por nombre (ver migración 014)
+Index(
+    "ix_users_active_role_full_name",
+    User.role_id, User.full_name,
+    postgresql_where=User.is_active.is_(True)
+)
 
 
 # --- FALTABA ESTO ---
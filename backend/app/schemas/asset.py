@@ -495,6 +495,42 @@ class BulkFXTransactionsRequest(BaseModel):
     transactions: List[FXTransactionCreate]
 
 
+class BulkCashJournalRequest(BaseModel):
+    """Schema for bulk cash journal creation."""
+    entries: List[CashJournalCreate]
+
+
+class CorporateActionCreate(BaseModel):
+    """Schema for creating a corporate action (fields mirror the table columns)."""
+    account_id: int
+    asset_id: Optional[int] = None
+    ib_action_id: Optional[str] = None
+    transaction_id: Optional[str] = None
+    action_type: Optional[str] = None
+    report_date: Optional[date] = None
+    execution_date: Optional[date] = None
+    description: Optional[str] = None
+    ratio_old: Optional[Decimal] = None
+    ratio_new: Optional[Decimal] = None
+    quantity_adjustment: Optional[Decimal] = None
+    symbol: Optional[str] = None
+    isin: Optional[str] = None
+    cusip: Optional[str] = None
+    security_id: Optional[str] = None
+    security_id_type: Optional[str] = None
+    amount: Optional[Decimal] = None
+    proceeds: Optional[Decimal] = None
+    value: Optional[Decimal] = None
+    fifo_pnl_realized: Optional[Decimal] = None
+    mtm_pnl: Optional[Decimal] = None
+    currency: Optional[str] = None
+
+
+class BulkCorporateActionsRequest(BaseModel):
+    """Schema for bulk corporate actions creation."""
+    actions: List[CorporateActionCreate]
+
+
 class BulkPositionsRequest(BaseModel):
     """Schema for bulk positions creation/update."""
     positions: List[PositionCreate]
@@ -5,13 +5,16 @@ Provides functions for computing and managing TWR data per portfolio/account.
 Only tracks _USD accounts (main accounts; other currencies are virtual).
 """
 
+import io
 import logging
 from datetime import date, timedelta
 from decimal import Decimal
-from typing import Optional, List, Dict, Any
+from itertools import chain, islice
+from typing import Optional, List, Dict, Any, Iterable
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.portfolio import Portfolio, Account, TWRDaily
 from app.models.asset import CashJournal, ETLSyncStatus
@@ -24,6 +27,11 @@ TWR_CASH_TYPES = (
     'ACATIN', 'ACATOUT', 'ACATOUTCNCL'
 )
 
+# Rows per chunk in upsert_nav_batch (NLV_HISTORY uploads can be 100k+ rows)
+NAV_UPSERT_CHUNK_SIZE = 1000
+# From this many rows upsert_nav_batch switches from multi-row INSERTs to COPY
+NAV_COPY_THRESHOLD = 5000
+
 
 def _get_usd_account_ids(db: Session, portfolio_id: int) -> List[int]:
     """Get only the _USD account IDs for a portfolio (main accounts for TWR)."""
@@ -38,90 +46,99 @@ def _get_usd_account_ids(db: Session, portfolio_id: int) -> List[int]:
     return [a.account_id for a in accounts]
 
 
-def _calculate_twr_for_account(db: Session, account_id: int, cutoff_date: date = None, debug: bool = False):
-    """
-    Calculate daily HP and cumulative TWR for one account.
-
-    HP = (End_NAV - (Start_NAV + CashFlow)) / (Start_NAV + CashFlow)
-    TWR = product(1 + HP_i) - 1
-    """
-    rows = (
-        db.query(TWRDaily)
-        .filter(TWRDaily.account_id == account_id)
-        .order_by(TWRDaily.date.asc())
-        .all()
-    )
-
-    if len(rows) < 2:
-        if debug:
-            logger.info(f"[TWR DEBUG] Account {account_id}: Not enough rows ({len(rows)}) for TWR calculation")
-        return
-
-    if cutoff_date is None:
-        cutoff_date = rows[0].date
-
-    window = [r for r in rows if r.date >= cutoff_date]
-    if len(window) < 2:
-        if debug:
-            logger.info(f"[TWR DEBUG] Account {account_id}: Not enough rows in window after cutoff {cutoff_date}")
-        return
-
-    if debug:
-        logger.info(f"[TWR DEBUG] Account {account_id}: Starting calculation from {cutoff_date}, {len(window)} rows in window")
-
-    cumulative_twr = Decimal("1")
-
-    for i, row in enumerate(window):
-        row.initial_hp_date = cutoff_date
-
-        if i == 0:
-            row.hp = None
-            row.twr = Decimal("0")
-            if debug:
-                logger.info(f"[TWR DEBUG] {row.date}: Initial row - NAV={row.nav}, HP=None, TWR=0.0000%")
-            continue
+def _upsert_nav_chunks(db: Session, rows_iter, resolve, stats: Dict[str, Any]) -> None:
+    """One INSERT ... ON CONFLICT DO UPDATE per NAV_UPSERT_CHUNK_SIZE rows."""
+    while True:
+        chunk = list(islice(rows_iter, NAV_UPSERT_CHUNK_SIZE))
+        if not chunk:
+            break
 
-        prev = window[i - 1]
-        if prev.nav is None or row.nav is None:
-            if debug:
-                logger.warning(f"[TWR DEBUG] {row.date}: Skipping - missing NAV data (prev={prev.nav}, current={row.nav})")
+        values = [v for v in map(resolve, chunk) if v is not None]
+        if not values:
             continue
 
-        start_nav = prev.nav
-        cash_flow = row.sum_cash_journal or Decimal("0")
-        end_nav = row.nav
-
-        denominator = start_nav + cash_flow
-        if denominator == 0:
-            row.hp = Decimal("0")
-            if debug:
-                logger.warning(f"[TWR DEBUG] {row.date}: Zero denominator - HP set to 0")
-        else:
-            row.hp = (end_nav - denominator) / denominator
-
-        cumulative_twr *= (Decimal("1") + row.hp)
-        row.twr = cumulative_twr - Decimal("1")
-
-        if debug:
-            logger.info(
-                f"[TWR DEBUG] {row.date}: "
-                f"NAV={float(end_nav):,.2f}, "
-                f"PrevNAV={float(start_nav):,.2f}, "
-                f"CashFlow={float(cash_flow):,.2f}, "
-                f"Denominator={float(denominator):,.2f}, "
-                f"HP={float(row.hp)*100:.4f}%, "
-                f"CumulativeMultiplier={float(cumulative_twr):.6f}, "
-                f"TWR={float(row.twr)*100:.4f}%"
+        # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement:
+        # repeated (account_id, date) keys in the chunk keep the last NAV
+        latest = {(account_id, nav_date): nav for account_id, nav_date, nav in values}
+        stats["records_updated"] += len(values) - len(latest)
+
+        # xmax = 0 marks inserted rows
+        stmt = pg_insert(TWRDaily.__table__).values([
+            {"account_id": account_id, "date": nav_date, "nav": nav, "sum_cash_journal": Decimal("0")}
+            for (account_id, nav_date), nav in latest.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["account_id", "date"],
+            set_={"nav": stmt.excluded.nav, "updated_at": func.now()},
+        ).returning(literal_column("xmax = 0"))
+
+        for inserted in db.execute(stmt).scalars():
+            if inserted:
+                stats["records_created"] += 1
+            else:
+                stats["records_updated"] += 1
+
+
+def _upsert_nav_copy(db: Session, rows_iter, resolve, stats: Dict[str, Any]) -> None:
+    """
+    Large batches: COPY the resolved rows into a temp table (chunk by chunk,
+    no per-row SQL) and upsert them into twr_daily with a single
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE. Last NAV wins on repeated keys.
+    """
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE tmp_nav_upsert "
+            "(seq bigint, account_id integer, date date, nav numeric) ON COMMIT DROP"
+        )
+        copied = 0
+        while True:
+            chunk = list(islice(rows_iter, NAV_UPSERT_CHUNK_SIZE))
+            if not chunk:
+                break
+            buf = io.StringIO()
+            for value in map(resolve, chunk):
+                if value is None:
+                    continue
+                account_id, nav_date, nav = value
+                buf.write(f"{copied}\t{account_id}\t{nav_date.isoformat()}\t{nav}\n")
+                copied += 1
+            buf.seek(0)
+            cursor.copy_expert("COPY tmp_nav_upsert (seq, account_id, date, nav) FROM STDIN", buf)
+
+        if not copied:
+            return
+
+        cursor.execute(
+            """
+            WITH upserted AS (
+                INSERT INTO twr_daily (account_id, date, nav, sum_cash_journal)
+                SELECT DISTINCT ON (account_id, date) account_id, date, nav, 0
+                FROM tmp_nav_upsert
+                ORDER BY account_id, date, seq DESC
+                ON CONFLICT (account_id, date)
+                DO UPDATE SET nav = EXCLUDED.nav, updated_at = now()
+                RETURNING xmax = 0 AS inserted
             )
-
-    db.flush()
+            SELECT count(*) FILTER (WHERE inserted) FROM upserted
+            """
+        )
+        created = cursor.fetchone()[0]
+        # Updated rows plus repeated keys that were superseded in the batch
+        stats["records_created"] += created
+        stats["records_updated"] += copied - created
+    finally:
+        cursor.close()
 
 
-def upsert_nav_batch(db: Session, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+def upsert_nav_batch(db: Session, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Upsert NAV rows into twr_daily from a batch of
     {account_code: str, date: date, nav: float}.
     Resolves account_code to account_id. Only processes _USD accounts.
+    `rows` can be any iterable (the endpoint passes a generator): it is consumed
+    in chunks of NAV_UPSERT_CHUNK_SIZE, so only one chunk is materialized at a time.
+    Batches of NAV_COPY_THRESHOLD rows or more are loaded through COPY.
     """
     stats = {
         "records_created": 0,
@@ -136,47 +153,143 @@ def upsert_nav_batch(db: Session, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 
     missing_set = set()
 
-    for entry in rows:
-        account_code = entry["account_code"]
-        account_id = acc_map.get(account_code)
+    def resolve(entry):
+        account_id = acc_map.get(entry["account_code"])
         if not account_id:
-            if account_code not in missing_set:
-                missing_set.add(account_code)
+            missing_set.add(entry["account_code"])
             stats["records_failed"] += 1
-            continue
-
-        nav_date = entry["date"]
-        nav = Decimal(str(entry["nav"]))
+            return None
+        return account_id, entry["date"], Decimal(str(entry["nav"]))
 
-        existing = (
-            db.query(TWRDaily)
-            .filter(
-                TWRDaily.account_id == account_id,
-                TWRDaily.date == nav_date,
-            )
-            .first()
-        )
-        if existing:
-            existing.nav = nav
-            existing.updated_at = func.now()
-            stats["records_updated"] += 1
-        else:
-            new_row = TWRDaily(
-                account_id=account_id,
-                date=nav_date,
-                nav=nav,
-                sum_cash_journal=Decimal("0"),
-            )
-            db.add(new_row)
-            stats["records_created"] += 1
+    rows_iter = iter(rows)
+    head = list(islice(rows_iter, NAV_COPY_THRESHOLD))
+    if len(head) < NAV_COPY_THRESHOLD:
+        _upsert_nav_chunks(db, iter(head), resolve, stats)
+    else:
+        _upsert_nav_copy(db, chain(head, rows_iter), resolve, stats)
 
-    db.flush()
     db.commit()
 
     stats["missing_accounts"] = list(missing_set)
     return stats
 
 
+def _twr_kernel(navs: List[Optional[Decimal]], cash_flows: List[Decimal]) -> List[Optional[tuple]]:
+    """
+    Pure HP/TWR math over a cutoff window (no ORM, no DB).
+    navs[0] is the initial HP row. Returns one (hp, twr) per row, or None for
+    rows skipped because their NAV or the previous NAV is missing
+    (those keep whatever hp/twr they already had).
+    """
+    one = Decimal("1")
+    cumulative_twr = one
+    out: List[Optional[tuple]] = [(None, Decimal("0"))]
+
+    for i in range(1, len(navs)):
+        start_nav = navs[i - 1]
+        end_nav = navs[i]
+        if start_nav is None or end_nav is None:
+            out.append(None)
+            continue
+
+        denominator = start_nav + cash_flows[i]
+        hp = Decimal("0") if denominator == 0 else (end_nav - denominator) / denominator
+        cumulative_twr *= (one + hp)
+        out.append((hp, cumulative_twr - one))
+
+    return out
+
+
+def _fill_and_calculate_account(
+    db: Session,
+    account_id: int,
+    cutoff_date: Optional[date],
+    sum_map: Dict[date, Decimal],
+    debug: bool = False,
+) -> tuple:
+    """
+    Fill sum_cash_journal and recompute HP/TWR for one account from a column
+    projection of its twr_daily rows, writing everything back with a single
+    executemany UPDATE by primary key.
+    Returns (rows filled, rows with TWR set).
+
+    HP = (End_NAV - (Start_NAV + CashFlow)) / (Start_NAV + CashFlow)
+    TWR = product(1 + HP_i) - 1
+    """
+    rows = db.execute(
+        select(
+            TWRDaily.twr_daily_id, TWRDaily.date, TWRDaily.nav, TWRDaily.sum_cash_journal,
+            TWRDaily.hp, TWRDaily.twr, TWRDaily.initial_hp_date,
+        )
+        .where(TWRDaily.account_id == account_id)
+        .order_by(TWRDaily.date.asc())
+    ).all()
+
+    if debug:
+        logger.info(f"[TWR DEBUG] Found {len(rows)} twr_daily rows, date range: {rows[0].date if rows else 'N/A'} to {rows[-1].date if rows else 'N/A'}")
+        logger.info(f"[TWR DEBUG] Found cash flows for {len(sum_map)} dates")
+        for flow_date, flow_amount in sorted(sum_map.items()):
+            logger.info(f"[TWR DEBUG] Cash flow on {flow_date}: ${float(flow_amount):,.2f}")
+
+    if not rows:
+        return 0, 0
+
+    params = [
+        {
+            "twr_daily_id": r.twr_daily_id,
+            "sum_cash_journal": sum_map.get(r.date, Decimal("0")),
+            "hp": r.hp,
+            "twr": r.twr,
+            "initial_hp_date": r.initial_hp_date,
+        }
+        for r in rows
+    ]
+
+    if debug:
+        for r, p in zip(rows, params):
+            if r.sum_cash_journal != p["sum_cash_journal"]:
+                logger.info(f"[TWR DEBUG] Updated cash flow for {r.date}: ${float(r.sum_cash_journal or 0):,.2f} -> ${float(p['sum_cash_journal']):,.2f}")
+
+    if cutoff_date is None:
+        cutoff_date = rows[0].date
+    start = next((i for i, r in enumerate(rows) if r.date >= cutoff_date), len(rows))
+
+    if len(rows) < 2 or len(rows) - start < 2:
+        if debug:
+            logger.info(f"[TWR DEBUG] Account {account_id}: Not enough rows in window after cutoff {cutoff_date}")
+    else:
+        window = rows[start:]
+        cash_flows = [p["sum_cash_journal"] for p in params[start:]]
+        if debug:
+            logger.info(f"[TWR DEBUG] Account {account_id}: Starting calculation from {cutoff_date}, {len(window)} rows in window")
+
+        results = _twr_kernel([r.nav for r in window], cash_flows)
+        for i, (p, result) in enumerate(zip(params[start:], results)):
+            p["initial_hp_date"] = cutoff_date
+            if result is not None:
+                p["hp"], p["twr"] = result
+            if not debug:
+                continue
+            row = window[i]
+            if i == 0:
+                logger.info(f"[TWR DEBUG] {row.date}: Initial row - NAV={row.nav}, HP=None, TWR=0.0000%")
+            elif result is None:
+                logger.warning(f"[TWR DEBUG] {row.date}: Skipping - missing NAV data (prev={window[i - 1].nav}, current={row.nav})")
+            else:
+                logger.info(
+                    f"[TWR DEBUG] {row.date}: "
+                    f"NAV={float(row.nav):,.2f}, "
+                    f"PrevNAV={float(window[i - 1].nav):,.2f}, "
+                    f"CashFlow={float(cash_flows[i]):,.2f}, "
+                    f"HP={float(p['hp'])*100:.4f}%, "
+                    f"TWR={float(p['twr'])*100:.4f}%"
+                )
+
+    # ORM bulk UPDATE by primary key -> one executemany (psycopg2 execute_batch)
+    db.execute(update(TWRDaily), params)
+    return len(params), sum(1 for p in params if p["twr"] is not None)
+
+
 def fill_cash_and_calculate(db: Session) -> Dict[str, Any]:
     """
     Fill sum_cash_journal from cash_journal table and calculate TWR
@@ -185,53 +298,43 @@ def fill_cash_and_calculate(db: Session) -> Dict[str, Any]:
     """
     stats = {"cash_journal_filled": 0, "twr_calculated": 0}
 
-    # Get distinct account IDs that have twr_daily rows (only _USD)
-    account_ids = (
-        db.query(TWRDaily.account_id)
-        .distinct()
+    # _USD accounts that have twr_daily rows, with their cutoff, in one query
+    accounts = (
+        db.query(Account.account_id, Account.twr_cutoff_date)
+        .filter(
+            Account.account_code.like('%_USD'),
+            Account.account_id.in_(select(TWRDaily.account_id).distinct()),
+        )
         .all()
     )
-
-    for (account_id,) in account_ids:
-        # Check this is a _USD account
-        acc = db.query(Account).filter(Account.account_id == account_id).first()
-        if not acc or not acc.account_code.endswith('_USD'):
-            continue
-
-        twr_rows = (
-            db.query(TWRDaily)
-            .filter(TWRDaily.account_id == account_id)
-            .order_by(TWRDaily.date.asc())
-            .all()
+    if not accounts:
+        db.commit()
+        return stats
+
+    # Cash flow sums for every account at once; only twr_daily dates are looked up
+    sum_maps: Dict[int, Dict[date, Decimal]] = {}
+    sums = (
+        db.query(
+            CashJournal.account_id,
+            CashJournal.date,
+            func.sum(CashJournal.amount).label("total"),
         )
-        dates = [r.date for r in twr_rows]
-        if not dates:
-            continue
-
-        # Fill cash journal sums
-        sums = (
-            db.query(
-                CashJournal.date,
-                func.sum(CashJournal.amount).label("total"),
-            )
-            .filter(
-                CashJournal.account_id == account_id,
-                CashJournal.date.in_(dates),
-                CashJournal.type.in_(TWR_CASH_TYPES),
-            )
-            .group_by(CashJournal.date)
-            .all()
+        .filter(
+            CashJournal.account_id.in_([a.account_id for a in accounts]),
+            CashJournal.type.in_(TWR_CASH_TYPES),
         )
-        sum_map = {s.date: s.total for s in sums}
-        for row in twr_rows:
-            row.sum_cash_journal = sum_map.get(row.date, Decimal("0"))
-            stats["cash_journal_filled"] += 1
-
-        # Calculate TWR (use account's own cutoff date)
-        cutoff = acc.twr_cutoff_date
+        .group_by(CashJournal.account_id, CashJournal.date)
+        .all()
+    )
+    for s in sums:
+        sum_maps.setdefault(s.account_id, {})[s.date] = s.total
 
-        _calculate_twr_for_account(db, account_id, cutoff_date=cutoff)
-        stats["twr_calculated"] += len([r for r in twr_rows if r.twr is not None])
+    for account_id, cutoff in accounts:
+        filled, calculated = _fill_and_calculate_account(
+            db, account_id, cutoff, sum_maps.get(account_id, {})
+        )
+        stats["cash_journal_filled"] += filled
+        stats["twr_calculated"] += calculated
 
     db.commit()
     return stats
@@ -585,48 +688,22 @@ def recalculate_twr(db: Session, account_id: int, debug: bool = False) -> Dict[s
         logger.info(f"[TWR DEBUG] ===== Recalculating TWR for account {account_id} ({account.account_code}) =====")
         logger.info(f"[TWR DEBUG] Cutoff date: {cutoff}")
 
-    # First refill cash journal sums for this account
-    twr_rows = (
-        db.query(TWRDaily)
-        .filter(TWRDaily.account_id == account_id)
-        .order_by(TWRDaily.date.asc())
+    # Cash flow sums for this account; only twr_daily dates are looked up
+    sums = (
+        db.query(
+            CashJournal.date,
+            func.sum(CashJournal.amount).label("total"),
+        )
+        .filter(
+            CashJournal.account_id == account_id,
+            CashJournal.type.in_(TWR_CASH_TYPES),
+        )
+        .group_by(CashJournal.date)
         .all()
     )
-    dates = [r.date for r in twr_rows]
-    
-    if debug:
-        logger.info(f"[TWR DEBUG] Found {len(twr_rows)} twr_daily rows, date range: {min(dates) if dates else 'N/A'} to {max(dates) if dates else 'N/A'}")
-    
-    if dates:
-        sums = (
-            db.query(
-                CashJournal.date,
-                func.sum(CashJournal.amount).label("total"),
-            )
-            .filter(
-                CashJournal.account_id == account_id,
-                CashJournal.date.in_(dates),
-                CashJournal.type.in_(TWR_CASH_TYPES),
-            )
-            .group_by(CashJournal.date)
-            .all()
-        )
-        sum_map = {s.date: s.total for s in sums}
-        
-        if debug:
-            logger.info(f"[TWR DEBUG] Found cash flows for {len(sum_map)} dates")
-            for flow_date, flow_amount in sorted(sum_map.items()):
-                logger.info(f"[TWR DEBUG] Cash flow on {flow_date}: ${float(flow_amount):,.2f}")
-        
-        for row in twr_rows:
-            old_sum = row.sum_cash_journal
-            row.sum_cash_journal = sum_map.get(row.date, Decimal("0"))
-            if debug and old_sum != row.sum_cash_journal:
-                logger.info(f"[TWR DEBUG] Updated cash flow for {row.date}: ${float(old_sum or 0):,.2f} -> ${float(row.sum_cash_journal):,.2f}")
-
-    # Recalculate TWR with debug logging
-    _calculate_twr_for_account(db, account_id, cutoff_date=cutoff, debug=debug)
-    total_calculated = len([r for r in twr_rows if r.twr is not None])
+    sum_map = {s.date: s.total for s in sums}
+
+    _, total_calculated = _fill_and_calculate_account(db, account_id, cutoff, sum_map, debug=debug)
 
     db.commit()
 
@@ -0,0 +1,22 @@
+-- Migration 009: Composite indexes for the transaction list endpoints
+-- ===========================================================================
+-- /transactions/trades, /cash-journal, /fx-transactions and /corporate-actions
+-- filter by account and order by date DESC. With these indexes Postgres reads
+-- the requested page straight from the index instead of sort-after-scan.
+
+CREATE INDEX IF NOT EXISTS ix_trades_account_trade_date
+    ON trades (account_id, trade_date DESC);
+
+CREATE INDEX IF NOT EXISTS ix_cash_journal_account_date
+    ON cash_journal (account_id, date DESC);
+
+CREATE INDEX IF NOT EXISTS ix_fx_transactions_account_trade_date
+    ON fx_transactions (account_id, trade_date DESC);
+
+-- FX lookups also match on the target account (OR filter)
+CREATE INDEX IF NOT EXISTS ix_fx_transactions_target_account_trade_date
+    ON fx_transactions (target_account_id, trade_date DESC)
+    WHERE target_account_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_corporate_actions_account_report_date
+    ON corporate_actions (account_id, report_date DESC);
@@ -0,0 +1,7 @@
+-- Migration 010: Index on assets.symbol
+-- ===========================================================================
+-- /transactions/trades?symbol=AAPL,MSFT resolves the symbols with
+-- assets.symbol IN (...). Symbols are not unique across asset classes,
+-- so this is a plain (non-unique) B-tree index.
+
+CREATE INDEX IF NOT EXISTS ix_assets_symbol ON assets (symbol);
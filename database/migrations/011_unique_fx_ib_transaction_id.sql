@@ -0,0 +1,42 @@
+-- Migration 011: Unique index on fx_transactions.ib_transaction_id
+-- ===========================================================================
+-- The bulk endpoints now deduplicate with INSERT ... ON CONFLICT DO NOTHING
+-- instead of pre-loading the existing ids in Python. That needs a unique
+-- index on every dedup column; trades.ib_transaction_id,
+-- cash_journal.reference_code and corporate_actions.ib_action_id already
+-- have one, fx_transactions.ib_transaction_id only had a plain index (002).
+--
+-- The plain index is replaced by a unique one with the same name (the name
+-- SQLAlchemy uses for unique=True, index=True). If duplicated ids already
+-- exist the migration aborts listing how many, so they can be cleaned first.
+
+DO $$
+DECLARE
+    dup_count INTEGER;
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'ix_fx_transactions_ib_transaction_id'
+          AND i.indisunique
+    ) THEN
+        RETURN;
+    END IF;
+
+    SELECT COUNT(*) INTO dup_count
+    FROM (
+        SELECT ib_transaction_id
+        FROM fx_transactions
+        WHERE ib_transaction_id IS NOT NULL
+        GROUP BY ib_transaction_id
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF dup_count > 0 THEN
+        RAISE EXCEPTION 'fx_transactions has % duplicated ib_transaction_id values; remove them before applying migration 011', dup_count;
+    END IF;
+
+    DROP INDEX IF EXISTS ix_fx_transactions_ib_transaction_id;
+    CREATE UNIQUE INDEX ix_fx_transactions_ib_transaction_id ON fx_transactions (ib_transaction_id);
+END $$;
@@ -0,0 +1,35 @@
+-- Migration 012: Unique (account_id, asset_id, report_date) on positions
+-- ===========================================================================
+-- /transactions/positions/bulk now upserts with a single
+-- INSERT ... ON CONFLICT (account_id, asset_id, report_date) DO UPDATE
+-- instead of a SELECT + UPDATE/INSERT per row, which needs a unique
+-- constraint on the key. The endpoint already treated it as unique.
+--
+-- If duplicated keys already exist the migration aborts listing how many,
+-- so they can be cleaned first.
+
+DO $$
+DECLARE
+    dup_count INTEGER;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_positions_account_asset_date'
+    ) THEN
+        RETURN;
+    END IF;
+
+    SELECT COUNT(*) INTO dup_count
+    FROM (
+        SELECT account_id, asset_id, report_date
+        FROM positions
+        GROUP BY account_id, asset_id, report_date
+        HAVING COUNT(*) > 1
+    ) d;
+
+    IF dup_count > 0 THEN
+        RAISE EXCEPTION 'positions has % duplicated (account_id, asset_id, report_date) keys; remove them before applying migration 012', dup_count;
+    END IF;
+
+    ALTER TABLE positions
+        ADD CONSTRAINT uq_positions_account_asset_date UNIQUE (account_id, asset_id, report_date);
+END $$;
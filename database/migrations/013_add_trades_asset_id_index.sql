@@ -0,0 +1,8 @@
+-- Migration 013: Index on trades.asset_id
+-- ===========================================================================
+-- /transactions/trades?symbol=... now resolves the symbols to asset_ids
+-- first (ix_assets_symbol, migration 010) and filters trades with
+-- asset_id IN (...) instead of joining assets, so the FK column needs
+-- its own index.
+
+CREATE INDEX IF NOT EXISTS ix_trades_asset_id ON trades (asset_id);
@@ -0,0 +1,10 @@
+-- Migration 014: Partial index for the investor/advisor listings
+-- ===========================================================================
+-- /users/investors and /users/advisors filter role_id = ? AND is_active
+-- and order by full_name. A partial index on active users, keyed by role
+-- and name, returns the page in order without a separate sort.
+-- (twr_daily (account_id, date) is already covered by migration 006.)
+
+CREATE INDEX IF NOT EXISTS ix_users_active_role_full_name
+    ON users (role_id, full_name)
+    WHERE is_active = true;